@@ -0,0 +1,40 @@
+import gzip
+import hashlib
+
+import brotli
+from rest_framework.renderers import JSONRenderer
+
+from core.cache import CATALOGUE_GENERATION_KEY, Snapshot
+from recipes.models import Ingredient, Tag
+from .serializers import IngredientSerializer, TagSerializer
+
+
+class CatalogueSnapshot(Snapshot):
+    generation_key = CATALOGUE_GENERATION_KEY
+    models = (Tag, Ingredient)
+    encodings = ('br', 'gzip')
+
+    def __init__(self):
+        super().__init__()
+        self._content = ({}, None)
+
+    def get(self, encoding=None):
+        self.refresh()
+        bodies, etag = self._content
+        return bodies[encoding], etag
+
+    def _build(self):
+        content = JSONRenderer().render({
+            'tags': TagSerializer(Tag.objects.all(), many=True).data,
+            'ingredients': IngredientSerializer(
+                Ingredient.objects.all(), many=True
+            ).data,
+        })
+        self._content = ({
+            None: content,
+            'gzip': gzip.compress(content, compresslevel=9),
+            'br': brotli.compress(content, quality=11),
+        }, hashlib.md5(content).hexdigest())
+
+
+catalogue_snapshot = CatalogueSnapshot()
@@ -0,0 +1,105 @@
+import binascii
+import uuid
+from base64 import b64decode
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_CHUNK_SIZE = 64 * 1024
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+
+
+class RecipeImageField(serializers.ImageField):
+    default_error_messages = {
+        'invalid_image': 'Загрузите корректное изображение.',
+        'invalid_type': 'Изображение должно быть строкой base64.',
+        'max_size': 'Размер изображения не должен превышать {max_size} МБ.',
+        'max_dimension': ('Размер изображения не должен превышать '
+                          '{max_dimension} пикселей по каждой стороне.'),
+        'max_pixels': ('Изображение не должно содержать больше '
+                       '{max_pixels} мегапикселей.'),
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid_type')
+        start = data.find(';base64,')
+        start = 0 if start == -1 else start + len(';base64,')
+        if (len(data) - start) * 3 // 4 > settings.MAX_IMAGE_UPLOAD_SIZE:
+            self.fail_max_size()
+        file = self.decode(data, start)
+        try:
+            image_format = self.verify_header(file)
+            uploaded = UploadedFile(
+                file=file,
+                name=f'{uuid.uuid4()}.{IMAGE_FORMATS[image_format]}',
+                content_type=Image.MIME[image_format],
+                size=file.tell()
+            )
+            return serializers.FileField.to_internal_value(self, uploaded)
+        except Exception:
+            file.close()
+            raise
+
+    def decode(self, data, start):
+        file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        tail = ''
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+                chunk = tail + ''.join(
+                    data[offset:offset + BASE64_CHUNK_SIZE].split()
+                )
+                cut = len(chunk) - len(chunk) % 4
+                chunk, tail = chunk[:cut], chunk[cut:]
+                file.write(b64decode(chunk, validate=True))
+                if file.tell() > settings.MAX_IMAGE_UPLOAD_SIZE:
+                    self.fail_max_size()
+            if tail:
+                raise ValueError('incomplete base64 data')
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_image')
+        except serializers.ValidationError:
+            file.close()
+            raise
+        if not file.tell():
+            file.close()
+            self.fail('invalid_image')
+        return file
+
+    def verify_header(self, file):
+        size = file.tell()
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                image_format = image.format
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail_max_pixels()
+        except (OSError, ValueError):
+            self.fail('invalid_image')
+        if image_format not in IMAGE_FORMATS:
+            self.fail('invalid_image')
+        if max(width, height) > settings.MAX_IMAGE_DIMENSION:
+            self.fail(
+                'max_dimension', max_dimension=settings.MAX_IMAGE_DIMENSION
+            )
+        if width * height > settings.MAX_IMAGE_PIXELS:
+            self.fail_max_pixels()
+        file.seek(size)
+        return image_format
+
+    def fail_max_size(self):
+        self.fail(
+            'max_size', max_size=settings.MAX_IMAGE_UPLOAD_SIZE // 2 ** 20
+        )
+
+    def fail_max_pixels(self):
+        self.fail(
+            'max_pixels', max_pixels=settings.MAX_IMAGE_PIXELS // 10 ** 6
+        )
@@ -0,0 +1,120 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag, urlencode
+from rest_framework.response import Response
+
+from core.cache import get_generation
+from recipes.links import add_links, remove_links
+from .serializers import BulkLinksSerializer
+
+
+class AnonymousCacheMixin:
+    cache_timeout = settings.API_CACHE_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if (not request.user.is_anonymous
+                or request.accepted_renderer.format != 'json'):
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                response.add_post_render_callback(
+                    lambda response: self.store_response(key, response)
+                )
+            return response
+        content, content_type, etag = cached
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in parse_etags(if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        self.set_cache_headers(response, etag)
+        return response
+
+    def get_cache_key(self, request):
+        query = urlencode(sorted(request.GET.lists()), doseq=True)
+        digest = hashlib.md5(f'{request.path}?{query}'.encode('utf-8'))
+        return f'api_response:{get_generation()}:{digest.hexdigest()}'
+
+    def store_response(self, key, response):
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        cache.set(
+            key, (response.content, response['Content-Type'], etag),
+            self.cache_timeout
+        )
+        self.set_cache_headers(response, etag)
+
+    def set_cache_headers(self, response, etag):
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.API_CACHE_MAX_AGE
+        )
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+
+
+class BulkLinksMixin:
+    def bulk_links(self, request, model, target_field, owner_field,
+                   forbidden=()):
+        serializer = BulkLinksSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        add = serializer.validated_data['add']
+        remove = serializer.validated_data['remove']
+        target = model._meta.get_field(target_field)
+        owner = {model._meta.get_field(owner_field).attname: request.user.pk}
+        with transaction.atomic():
+            added = {
+                getattr(instance, target.attname)
+                for instance in add_links(
+                    model, target_field,
+                    [pk for pk in add if pk not in forbidden], **owner
+                )
+            }
+            removed = {
+                getattr(instance, target.attname)
+                for instance in remove_links(
+                    model, target_field, remove, **owner
+                )
+            }
+        unchanged = [
+            pk for pk in add + remove
+            if pk not in added and pk not in removed and pk not in forbidden
+        ]
+        existing = set(target.related_model.objects.filter(
+            pk__in=unchanged
+        ).values_list('pk', flat=True)) if unchanged else set()
+        return Response({
+            'add': [
+                {'id': pk, 'status': (
+                    'added' if pk in added
+                    else 'forbidden' if pk in forbidden
+                    else 'exists' if pk in existing
+                    else 'not_found'
+                )}
+                for pk in add
+            ],
+            'remove': [
+                {'id': pk, 'status': (
+                    'removed' if pk in removed
+                    else 'missing' if pk in existing or pk in forbidden
+                    else 'not_found'
+                )}
+                for pk in remove
+            ],
+        })
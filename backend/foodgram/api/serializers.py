@@ -1,11 +1,35 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
-from drf_extra_fields.fields import Base64ImageField
 
+from core import renderers
+from core.cache import bump_generation
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Subscription, Tag)
+                            ShoppingCart, ShoppingListExport, Subscription,
+                            Tag)
+from recipes.images import rendition_urls, schedule_renditions
+from recipes.search import update_search_index
 from users.models import User
+from .fields import RecipeImageField
+
+logger = logging.getLogger(__name__)
+
+
+def get_subscribed_ids(request):
+    if not hasattr(request, '_subscribed_ids'):
+        if request.user.is_anonymous:
+            request._subscribed_ids = frozenset()
+        else:
+            request._subscribed_ids = frozenset(
+                Subscription.objects.filter(
+                    follower=request.user
+                ).values_list('author_id', flat=True)
+            )
+    return request._subscribed_ids
 
 
 class UserListRetrieveSerializer(serializers.ModelSerializer):
@@ -19,12 +43,7 @@ class UserListRetrieveSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, object):
-        follower = self.context.get('request').user
-        if follower.is_anonymous:
-            return False
-        return Subscription.objects.filter(
-            follower=follower, author=object.id
-        ).exists()
+        return object.id in get_subscribed_ids(self.context.get('request'))
 
 
 class UserCreateSerializer(BaseUserCreateSerializer):
@@ -64,7 +83,7 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
 
 
 class IngredientAmountCreateSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientRecipe
@@ -76,7 +95,22 @@ class IngredientAmountCreateSerializer(serializers.ModelSerializer):
         return value
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class ImageRenditionsMixin(serializers.Serializer):
+    image_renditions = serializers.SerializerMethodField()
+
+    def get_image_renditions(self, obj):
+        if not obj.has_renditions:
+            return None
+        request = self.context.get('request')
+        renditions = rendition_urls(obj.image.name)
+        if request is not None:
+            for urls in renditions.values():
+                for format, url in urls.items():
+                    urls[format] = request.build_absolute_uri(url)
+        return renditions
+
+
+class RecipeSerializer(ImageRenditionsMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = UserListRetrieveSerializer()
     ingredients = serializers.SerializerMethodField()
@@ -87,15 +121,21 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_renditions', 'text',
+            'cooking_time'
         )
 
     def get_ingredients(self, obj):
-        return IngredientAmountSerializer(
-            IngredientRecipe.objects.filter(recipes=obj).all(), many=True
-        ).data
+        ingredients = obj.ingredientrecipe_set.all()
+        if 'ingredientrecipe_set' not in getattr(
+            obj, '_prefetched_objects_cache', {}
+        ):
+            ingredients = ingredients.select_related('ingredients')
+        return IngredientAmountSerializer(ingredients, many=True).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'favorited'):
+            return obj.favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -103,6 +143,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         return Favorite.objects.filter(user=user, recipe=recipe).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'in_shopping_cart'):
+            return obj.in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -115,7 +157,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = IngredientAmountCreateSerializer(many=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -147,23 +189,49 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 ingredients=ingredient['id'],
                 amount=ingredient['amount']) for ingredient in ingredients]
         IngredientRecipe.objects.bulk_create(ingredient_recipe)
+        update_search_index([obj.pk])
+        schedule_renditions(obj)
+        bump_generation()
         return obj
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        image_changed = 'image' in validated_data
+        self.rows_touched = {
+            'tags': 0 if tags is None else self.set_tags(instance, tags),
+            'ingredients': 0 if ingredients is None else self.set_ingredients(
+                instance, ingredients
+            ),
+        }
         for field, value in validated_data.items():
             setattr(instance, field, value)
         instance.save()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        ingredient_recipe = [IngredientRecipe(
-                recipes=instance,
-                ingredients=ingredient['id'],
-                amount=ingredient['amount']) for ingredient in ingredients]
-        IngredientRecipe.objects.bulk_create(ingredient_recipe)
+        logger.debug(
+            'Рецепт %s обновлён, изменено строк: %s',
+            instance.pk, self.rows_touched
+        )
+        if image_changed:
+            schedule_renditions(instance)
+        bump_generation()
         return instance
 
+    def set_tags(self, instance, tags):
+        current = set(instance.tags.values_list('pk', flat=True))
+        wanted = {tag.pk for tag in tags}
+        if current - wanted:
+            instance.tags.remove(*(current - wanted))
+        if wanted - current:
+            instance.tags.add(*(wanted - current))
+        return len(current ^ wanted)
+
+    def set_ingredients(self, instance, ingredients):
+        return IngredientRecipe.set_for_recipe(instance, {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        })
+
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
@@ -174,11 +242,29 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('должно больше нуля')
         return value
 
+    def validate_ingredients(self, value):
+        ids = [item['id'] for item in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'ингредиенты не должны повторяться'
+            )
+        ingredients = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in ingredients]
+        if missing:
+            raise serializers.ValidationError(
+                'ингредиенты не найдены: '
+                + ', '.join(str(pk) for pk in missing)
+            )
+        for item in value:
+            item['id'] = ingredients[item['id']]
+        return value
+
 
-class SimpleRecipeSerializer(serializers.ModelSerializer):
+class SimpleRecipeSerializer(ImageRenditionsMixin,
+                             serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -193,13 +279,14 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        return (not request.user == obj.author and Subscription.objects.filter(
-            follower=request.user, author=obj.author
-        ).exists())
+        return (request.user.id != obj.author_id
+                and obj.author_id in get_subscribed_ids(request))
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        if request.GET.get('recipes_limit'):
+        if hasattr(obj.author, 'feed_recipes'):
+            queryset = obj.author.feed_recipes
+        elif request.GET.get('recipes_limit'):
             recipes_limit = int(request.GET.get('recipes_limit'))
             queryset = Recipe.objects.filter(
                 author=obj.author
@@ -212,6 +299,8 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return serializer.data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj.author).count()
 
     class Meta:
@@ -244,3 +333,38 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingCart
         fields = ('id', 'name', 'image', 'cooking_time')
+
+
+class BulkLinksSerializer(serializers.Serializer):
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False,
+        max_length=settings.BULK_LINKS_MAX_IDS
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False,
+        max_length=settings.BULK_LINKS_MAX_IDS
+    )
+
+    def validate(self, data):
+        add = list(dict.fromkeys(data.get('add', [])))
+        remove = list(dict.fromkeys(data.get('remove', [])))
+        if not add and not remove:
+            raise serializers.ValidationError(
+                'Передайте id в списке add или remove'
+            )
+        if set(add) & set(remove):
+            raise serializers.ValidationError(
+                'Один id не может быть одновременно в add и remove'
+            )
+        return {'add': add, 'remove': remove}
+
+
+class ShoppingListExportSerializer(serializers.ModelSerializer):
+    format = serializers.ChoiceField(
+        choices=list(renderers.registry), default='pdf'
+    )
+
+    class Meta:
+        model = ShoppingListExport
+        fields = ('id', 'format', 'status', 'error', 'created')
+        read_only_fields = ('status', 'error', 'created')
@@ -0,0 +1,590 @@
+import base64
+import io
+import os
+import struct
+import threading
+import tracemalloc
+import zlib
+from unittest import skipIf
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.catalogue import catalogue_snapshot
+from api.fields import RecipeImageField
+from api.serializers import RecipeCreateSerializer
+from core import pdf
+from recipes.autocomplete import ingredient_index
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            RecipeRanking, ShoppingCart, Tag)
+from users.models import User
+
+
+def create_recipes(author, count, tags, ingredients):
+    recipes = [
+        Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='Текст',
+            image='recipes/images/test.jpg', cooking_time=10
+        )
+        for number in range(count)
+    ]
+    for recipe in recipes:
+        recipe.tags.set(tags)
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(
+                recipes=recipe, ingredients=ingredient, amount=100
+            )
+            for ingredient in ingredients
+        ])
+    return recipes
+
+
+def png_header(width, height):
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2,
+                                         0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(b'\x00'))
+            + chunk(b'IEND', b''))
+
+
+def as_base64(content, image_format='png'):
+    return (f'data:image/{image_format};base64,'
+            + base64.b64encode(content).decode('ascii'))
+
+
+class RecipeListQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        tags = [
+            Tag.objects.create(name='Завтрак', slug='breakfast'),
+            Tag.objects.create(name='Ужин', slug='dinner'),
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'Продукт {number}',
+                                      measurement_unit='г')
+            for number in range(3)
+        ]
+        recipes = create_recipes(author, 12, tags, ingredients)
+        for recipe in recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in recipes[::3]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_list_queries(self, client, queries):
+        for limit in (2, 12):
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = client.get('/api/recipes/', {'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_authenticated_list_query_count_does_not_grow_with_page(self):
+        self.assert_list_queries(self.client, 5)
+
+    def test_anonymous_list_query_count_does_not_grow_with_page(self):
+        self.assert_list_queries(APIClient(), 4)
+
+    def test_flags_come_from_annotations(self):
+        response = self.client.get('/api/recipes/', {'limit': 12})
+        favorited = set(Favorite.objects.filter(
+            user=self.user
+        ).values_list('recipe_id', flat=True))
+        in_cart = set(ShoppingCart.objects.filter(
+            user=self.user
+        ).values_list('recipe_id', flat=True))
+        for recipe in response.data['results']:
+            self.assertEqual(
+                recipe['is_favorited'], recipe['id'] in favorited
+            )
+            self.assertEqual(
+                recipe['is_in_shopping_cart'], recipe['id'] in in_cart
+            )
+
+
+class TrendingPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        cls.recipes = create_recipes(author, 4, [], [])
+        RecipeRanking.objects.bulk_create([
+            RecipeRanking(
+                recipe=recipe, window=RecipeRanking.WEEK, score=score,
+                updated=recipe.created
+            )
+            for score, recipe in enumerate(reversed(cls.recipes))
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_keeps_ranking_order(self):
+        expected = [recipe.pk for recipe in self.recipes]
+        for params in ({}, {'cursor': ''}):
+            with self.subTest(params=params):
+                response = APIClient().get('/api/recipes/trending/', params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [recipe['id'] for recipe in response.data['results']],
+                    expected
+                )
+
+
+class RecipeSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        beet = Ingredient.objects.create(name='Свёкла', measurement_unit='г')
+        cls.by_name, cls.by_ingredient, cls.by_text, _ = [
+            Recipe.objects.create(
+                author=author, name=name, text=text,
+                image='recipes/images/test.jpg', cooking_time=10
+            )
+            for name, text in (
+                ('Борщ', 'Суп'),
+                ('Суп', 'Варить час'),
+                ('Щи', 'Как борщ, только без свёклы'),
+                ('Омлет', 'Взбить яйца'),
+            )
+        ]
+        IngredientRecipe.objects.create(
+            recipes=cls.by_ingredient, ingredients=beet, amount=100
+        )
+        cls.by_ingredient.name = 'Холодный суп'
+        cls.by_ingredient.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, value):
+        response = APIClient().get('/api/recipes/', {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_name_matches_rank_above_text_matches(self):
+        self.assertEqual(
+            self.search('борщ'), [self.by_name.pk, self.by_text.pk]
+        )
+
+    def test_ingredient_names_are_searched(self):
+        self.assertEqual(
+            self.search('свёкл'), [self.by_ingredient.pk, self.by_text.pk]
+        )
+
+    def test_no_matches(self):
+        self.assertEqual(self.search('пельмени'), [])
+
+
+class RecipeFilterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        breakfast = Tag.objects.create(name='Завтрак', slug='breakfast')
+        dinner = Tag.objects.create(name='Ужин', slug='dinner')
+        Tag.objects.create(name='Обед', slug='lunch')
+        cls.breakfast, cls.dinner, _ = create_recipes(cls.author, 3, [], [])
+        cls.breakfast.tags.set([breakfast])
+        cls.dinner.tags.set([dinner])
+
+    def setUp(self):
+        cache.clear()
+
+    def filter(self, params):
+        return APIClient().get('/api/recipes/', params)
+
+    def ids(self, params):
+        response = self.filter(params)
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id'] for recipe in response.data['results']}
+
+    def test_tags_are_combined_with_or(self):
+        self.assertEqual(
+            self.ids({'tags': ['breakfast', 'dinner']}),
+            {self.breakfast.pk, self.dinner.pk}
+        )
+
+    def test_tag_without_recipes(self):
+        self.assertEqual(self.ids({'tags': 'lunch'}), set())
+
+    def test_unknown_tag_is_rejected(self):
+        self.assertEqual(self.filter({'tags': 'supper'}).status_code, 400)
+
+    def test_author(self):
+        self.assertEqual(len(self.ids({'author': self.author.pk})), 3)
+        self.assertEqual(self.ids({'author': self.reader.pk}), set())
+
+
+class QueryPlanTest(TestCase):
+
+    def test_no_full_scans(self):
+        call_command('check_query_plans', recipes=200, stdout=io.StringIO())
+
+
+class RecipeUpdateTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        cls.tags = [
+            Tag.objects.create(name='Завтрак', slug='breakfast'),
+            Tag.objects.create(name='Ужин', slug='dinner'),
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Продукт {number}',
+                                      measurement_unit='г')
+            for number in range(3)
+        ]
+        cls.recipe, = create_recipes(
+            cls.author, 1, cls.tags, cls.ingredients
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def unchanged_data(self):
+        return {
+            'name': self.recipe.name,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 100}
+                for ingredient in self.ingredients
+            ],
+        }
+
+    def row_ids(self):
+        return list(IngredientRecipe.objects.filter(
+            recipes=self.recipe
+        ).values_list('pk', 'ingredients_id', 'amount'))
+
+    def test_unchanged_update_touches_no_rows(self):
+        request = APIRequestFactory().patch('/')
+        request.user = self.author
+        before = self.row_ids()
+        serializer = RecipeCreateSerializer(
+            self.recipe, data=self.unchanged_data(), partial=True,
+            context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(
+            serializer.rows_touched, {'tags': 0, 'ingredients': 0}
+        )
+        self.assertEqual(self.row_ids(), before)
+
+    def test_unchanged_patch_keeps_ingredient_rows(self):
+        before = self.row_ids()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/', self.unchanged_data(),
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.row_ids(), before)
+        writes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith((
+                'INSERT INTO "recipes_ingredientrecipe"',
+                'UPDATE "recipes_ingredientrecipe"',
+                'DELETE FROM "recipes_ingredientrecipe"',
+            ))
+        ]
+        self.assertEqual(writes, [])
+
+    def test_changed_amount_updates_row_in_place(self):
+        data = self.unchanged_data()
+        data['ingredients'][0]['amount'] = 250
+        before = self.row_ids()
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.pk}/', data, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        after = self.row_ids()
+        self.assertEqual(
+            [pk for pk, _, _ in after], [pk for pk, _, _ in before]
+        )
+        self.assertEqual(after[0][2], 250)
+
+
+@skipIf(
+    connection.vendor == 'sqlite'
+    and not connection.settings_dict['TEST']['NAME'],
+    'Параллельные записи требуют файловой базы: задайте DB_TEST_NAME'
+)
+class ToggleConcurrencyTest(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        self.recipe, = create_recipes(self.author, 1, [], [])
+
+    def run_concurrently(self, method, url):
+        barrier = threading.Barrier(self.threads)
+        statuses = []
+
+        def worker():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                statuses.append(getattr(client, method)(url).status_code)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=worker) for _ in range(self.threads)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return sorted(statuses)
+
+    def assert_toggle(self, url, model, counter):
+        statuses = self.run_concurrently('post', url)
+        self.assertEqual(statuses, [201] + [400] * (self.threads - 1))
+        self.assertEqual(model.objects.filter(
+            user=self.user, recipe=self.recipe
+        ).count(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(getattr(self.recipe, counter), 1)
+        statuses = self.run_concurrently('delete', url)
+        self.assertEqual(statuses, [204] + [400] * (self.threads - 1))
+        self.assertFalse(model.objects.filter(
+            user=self.user, recipe=self.recipe
+        ).exists())
+        self.recipe.refresh_from_db()
+        self.assertEqual(getattr(self.recipe, counter), 0)
+
+    def test_concurrent_favorite(self):
+        self.assert_toggle(
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            Favorite, 'favorites_count'
+        )
+
+    def test_concurrent_shopping_cart(self):
+        self.assert_toggle(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+            ShoppingCart, 'in_carts_count'
+        )
+
+    def test_concurrent_subscribe(self):
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        statuses = self.run_concurrently('post', url)
+        self.assertEqual(statuses, [201] + [400] * (self.threads - 1))
+        statuses = self.run_concurrently('delete', url)
+        self.assertEqual(statuses, [204] + [400] * (self.threads - 1))
+        self.assertFalse(self.user.follower.exists())
+
+
+class ToggleNotFoundTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        cls.recipe, = create_recipes(cls.user, 1, [], [])
+
+    def test_missing_target_is_404(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        missing = self.recipe.pk + 1000
+        for url in (f'/api/recipes/{missing}/favorite/',
+                    f'/api/recipes/{missing}/shopping_cart/',
+                    f'/api/users/{missing}/subscribe/'):
+            for method in ('post', 'delete'):
+                with self.subTest(url=url, method=method):
+                    response = getattr(client, method)(url)
+                    self.assertEqual(response.status_code, 404)
+
+
+@override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=256 * 1024)
+class RecipeImageFieldMemoryTest(SimpleTestCase):
+    peak_limit = 2 ** 20
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        image = Image.frombytes(
+            'RGB', (1600, 1600), os.urandom(1600 * 1600 * 3)
+        )
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG', compress_level=1)
+        cls.content = buffer.getvalue()
+        cls.payload = as_base64(cls.content)
+
+    def decode(self, payload):
+        tracemalloc.start()
+        try:
+            try:
+                return RecipeImageField().to_internal_value(payload)
+            finally:
+                self.peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def assert_rejected(self, payload, code):
+        with self.assertRaises(ValidationError) as error:
+            self.decode(payload)
+        self.assertEqual(error.exception.get_codes(), [code])
+        self.assertLess(self.peak, self.peak_limit)
+
+    def test_large_payload_peak_memory_is_bounded(self):
+        self.assertGreater(len(self.content), 5 * self.peak_limit)
+        uploaded = self.decode(self.payload)
+        try:
+            self.assertEqual(uploaded.size, len(self.content))
+            self.assertEqual(uploaded.content_type, 'image/png')
+        finally:
+            uploaded.close()
+        self.assertLess(self.peak, self.peak_limit)
+
+    @override_settings(MAX_IMAGE_UPLOAD_SIZE=2 * 2 ** 20)
+    def test_oversize_payload_is_rejected(self):
+        self.assert_rejected(self.payload, 'max_size')
+
+    def test_over_dimension_header_is_rejected(self):
+        self.assert_rejected(
+            as_base64(png_header(9000, 10)), 'max_dimension'
+        )
+
+    def test_decompression_bomb_header_is_rejected(self):
+        self.assert_rejected(
+            as_base64(png_header(100000, 100000)), 'max_pixels'
+        )
+
+
+class ShoppingCartDownloadTest(TestCase):
+    url = '/api/recipes/download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        ingredients = [
+            Ingredient.objects.create(name='Мука', measurement_unit='г')
+        ]
+        recipe, = create_recipes(cls.user, 1, [], ingredients)
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pdf_etag_is_weak_and_survives_eviction(self):
+        first = self.client.get(self.url, {'format': 'pdf'})
+        pdf.render_cache.clear()
+        second = self.client.get(self.url, {'format': 'pdf'})
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertEqual(first['ETag'], second['ETag'])
+        response = self.client.get(
+            self.url, {'format': 'pdf'}, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_text_etag_is_strong(self):
+        response = self.client.get(self.url, {'format': 'txt'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        response = self.client.get(
+            self.url, {'format': 'txt'}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class IngredientIndexTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.create(name='Мука', measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+        ingredient_index.search('мука', 10)
+
+    def names(self, query):
+        return [item['name'] for item in ingredient_index.search(query, 10)]
+
+    def test_rows_loaded_elsewhere_are_found(self):
+        Ingredient.objects.bulk_create([
+            Ingredient(name='Мускатный орех', measurement_unit='г')
+        ])
+        self.assertEqual(self.names('му'), ['Мука', 'Мускатный орех'])
+
+    @override_settings(SNAPSHOT_MAX_AGE=0)
+    def test_rows_renamed_elsewhere_are_found_after_max_age(self):
+        Ingredient.objects.update(name='Манка')
+        self.assertEqual(self.names('ман'), ['Манка'])
+
+
+class CatalogueSnapshotTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+
+    def setUp(self):
+        cache.clear()
+        catalogue_snapshot.get()
+
+    def catalogue(self):
+        return APIClient().get('/api/catalogue/').json()
+
+    def test_rows_loaded_elsewhere_are_served(self):
+        Ingredient.objects.bulk_create([
+            Ingredient(name='Мука', measurement_unit='г')
+        ])
+        self.assertEqual(
+            [item['name'] for item in self.catalogue()['ingredients']],
+            ['Мука']
+        )
+
+    @override_settings(SNAPSHOT_MAX_AGE=0)
+    def test_rows_renamed_elsewhere_are_served_after_max_age(self):
+        Tag.objects.update(name='Обед')
+        self.assertEqual(
+            [item['name'] for item in self.catalogue()['tags']], ['Обед']
+        )
@@ -1,46 +1,121 @@
 from django.conf import settings
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import (BooleanField, Count, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import (FileResponse, HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
-from rest_framework import filters as filters
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.filters import OrderingFilter
+from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from core import pdf
+from core import renderers
+from recipes.autocomplete import ingredient_index
 from recipes.filters import RecipeFilter
+from recipes.links import add_link, remove_link
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Subscription, Tag)
+                            RecipeRanking, ShoppingCart, ShoppingListExport,
+                            Subscription, Tag)
 from recipes.paginators import CustomPagination
 from users.models import User
+from .catalogue import catalogue_snapshot
+from .mixins import AnonymousCacheMixin, BulkLinksMixin
 from .serializers import (FavoriteSerializer, IngredientSerializer,
                           RecipeCreateSerializer, RecipeSerializer,
-                          ShoppingCartSerializer, SubscriptionSerializer,
-                          TagSerializer)
+                          ShoppingCartSerializer,
+                          ShoppingListExportSerializer,
+                          SubscriptionSerializer, TagSerializer)
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(api_settings.SEARCH_PARAM)
+        if name:
+            return Response(ingredient_index.search(
+                name, settings.INGREDIENT_SEARCH_LIMIT
+            ))
+        return super().list(request, *args, **kwargs)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class CatalogueView(APIView):
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        accepted = {
+            value.split(';')[0].strip() for value in
+            request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+        }
+        encoding = next((
+            encoding for encoding in catalogue_snapshot.encodings
+            if encoding in accepted
+        ), None)
+        content, etag = catalogue_snapshot.get(encoding)
+        etag = quote_etag(f'{etag}-{encoding}' if encoding else etag)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in parse_etags(if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=0)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class RecipeViewSet(AnonymousCacheMixin, BulkLinksMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     pagination_class = CustomPagination
     filterset_class = RecipeFilter
-    ordering = ('-created',)
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    lookup_value_regex = r'\d+'
+    ordering_fields = ('created', 'favorites_count', 'in_carts_count')
+
+    def get_queryset(self):
+        queryset = Recipe.objects.select_related('author').defer(
+            'search_vector'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientrecipe_set',
+                queryset=IngredientRecipe.objects.select_related('ingredients')
+            )
+        )
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                favorited=Value(False, output_field=BooleanField()),
+                in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(
+            favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+        )
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -50,103 +125,139 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        return self.get_cached_response(self.get_trending, request)
+
+    def get_trending(self, request):
+        window = request.query_params.get('window', RecipeRanking.WEEK)
+        if window not in dict(RecipeRanking.WINDOW_CHOICES):
+            return Response(
+                {'errors': 'Период должен быть одним из: '
+                 + ', '.join(dict(RecipeRanking.WINDOW_CHOICES))},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page = self.paginate_queryset(self.get_trending_queryset(window))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_trending_queryset(self, window):
+        return self.filter_queryset(self.get_queryset()).filter(
+            rankings__window=window
+        ).order_by('-rankings__score', '-created')
+
+    @action(detail=False, methods=['post'], url_path='favorite',
+            permission_classes=[IsAuthenticated])
+    def bulk_favorite(self, request):
+        return self.bulk_links(request, Favorite, 'recipe', 'user')
+
+    @action(detail=False, methods=['post'], url_path='shopping_cart',
+            permission_classes=[IsAuthenticated])
+    def bulk_shopping_cart(self, request):
+        return self.bulk_links(request, ShoppingCart, 'recipe', 'user')
+
     @action(detail=True, methods=['post'])
     def favorite(self, request, pk=None):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        queryset, created = Favorite.objects. get_or_create(
-            user=user, recipe=recipe
-        )
-        if not created:
+        favorite = add_link(Favorite, 'recipe', pk, user_id=request.user.pk)
+        if favorite is None:
+            get_object_or_404(Recipe, pk=pk)
             return Response({'errors':
                             'Рецепт уже у вас в избранном.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        serializer = FavoriteSerializer(queryset, context={'request': request})
+        serializer = FavoriteSerializer(favorite, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
     def favorite_del(self, request, pk=None):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        favorite = Favorite.objects.filter(user=user, recipe=recipe)
-        if not favorite.exists():
+        if not remove_link(Favorite, 'recipe', pk, user_id=request.user.pk):
+            get_object_or_404(Recipe, pk=pk)
             return Response({'errors': 'Этого рецепта нет в избранном.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        favorite.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post'])
     def shopping_cart(self, request, pk=None):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        queryset, created = ShoppingCart.objects.get_or_create(
-            user=user, recipe=recipe
+        shopping_cart = add_link(
+            ShoppingCart, 'recipe', pk, user_id=request.user.pk
         )
-        if not created:
+        if shopping_cart is None:
+            get_object_or_404(Recipe, pk=pk)
             return Response({'errors':
                             'Рецепт уже у вас в список покупок.'},
                             status=status.HTTP_400_BAD_REQUEST)
         serializer = ShoppingCartSerializer(
-            queryset, context={'request': request}
+            shopping_cart, context={'request': request}
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
     def shopping_cart_del(self, request, pk=None):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        shopping_cart = ShoppingCart.objects.filter(user=user, recipe=recipe)
-        if not shopping_cart.exists():
+        if not remove_link(
+            ShoppingCart, 'recipe', pk, user_id=request.user.pk
+        ):
+            get_object_or_404(Recipe, pk=pk)
             return Response({'errors': 'Этого рецепта нет в списке покупок.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        shopping_cart.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    def make_pdf(self, header, data, filename, http_status):
-        site_name = settings.SITE_NAME
-        pdf_data = [
-            (pdf.Constant.DT_CAPTION, 'Мой список покупок:'),
-            (pdf.Constant.DT_EMPTYLINE, '')
-        ]
-        for ingredient in data:
-            pdf_data.append((
-                pdf.Constant.DT_TEXT,
-                '{name} - {amount}{measurement_unit}'.format(
-                    name=ingredient['ingredients__name'],
-                    amount=ingredient['amount'],
-                    measurement_unit=ingredient[
-                        'ingredients__measurement_unit'
-                    ]
-                )))
-        pdf_obj = pdf.PDFMarker()
-        pdf_obj.data = pdf_data
-        pdf_obj.footer_text = f'Список покупок с сайта {site_name}'
-
-        content = pdf_obj.pdf_render()
-        response = HttpResponse(
-            content=content,
-            content_type='application/pdf',
-            status=http_status)
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'],
+            renderer_classes=renderers.renderer_classes())
     def download_shopping_cart(self, request):
-        recipes = request.user.shopping_cart.all().values('recipe_id')
-        ingredients = IngredientRecipe.objects.filter(recipes__in=recipes)
-        if not ingredients:
+        lines = ShoppingCart.get_shopping_list(request.user)
+        if not lines:
             return Response(
                 {'errors': 'Список пуст'}, status=status.HTTP_204_NO_CONTENT
             )
-        total_ingredients = ingredients.values(
-            'ingredients__name', 'ingredients__measurement_unit').order_by(
-            'ingredients__name').annotate(amount=Sum('amount'))
-        return self.make_pdf(
-            ('Наименование', 'Количество', 'Ед.измерения'),
-            total_ingredients,
-            'shoppingcart.pdf',
-            status.HTTP_200_OK
+        renderer = request.accepted_renderer
+        etag = quote_etag(renderers.content_hash(lines, renderer.format))
+        if_none_match = {
+            tag[2:] if tag.startswith('W/') else tag for tag in
+            parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        }
+        matched = etag in if_none_match
+        if renderer.weak_etag:
+            etag = f'W/{etag}'
+        if matched:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+        response = StreamingHttpResponse(
+            renderer.stream(lines), content_type=renderer.content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shoppingcart.{renderer.format}"'
+        )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @action(detail=False, methods=['post'],
+            permission_classes=[IsAuthenticated])
+    def export_shopping_cart(self, request):
+        serializer = ShoppingListExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'],
+            url_path=r'export_shopping_cart/(?P<export_id>\d+)',
+            permission_classes=[IsAuthenticated])
+    def export_shopping_cart_status(self, request, export_id=None):
+        export = get_object_or_404(
+            ShoppingListExport, pk=export_id, user=request.user
         )
+        if export.status == ShoppingListExport.DONE:
+            renderer = renderers.registry[export.format]()
+            return FileResponse(
+                export.file.open('rb'),
+                as_attachment=True,
+                filename=f'shoppingcart.{export.format}',
+                content_type=renderer.content_type
+            )
+        serializer = ShoppingListExportSerializer(export)
+        if export.status == ShoppingListExport.FAILED:
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
 
 class SubscriptionViewSet(viewsets.ModelViewSet):
@@ -155,43 +266,61 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        return self.request.user.follower.all()
+        recipes = Recipe.objects.all()
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:int(recipes_limit)]
+            ))
+        return self.request.user.follower.select_related(
+            'author'
+        ).annotate(
+            recipes_count=Count('author__recipes')
+        ).order_by('-created').prefetch_related(
+            Prefetch('author__recipes', queryset=recipes,
+                     to_attr='feed_recipes')
+        )
 
 
-class SubscribeViewSet(viewsets.ModelViewSet):
+class SubscribeViewSet(BulkLinksMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = SubscriptionSerializer
     permission_classes = [IsAuthenticated]
+    lookup_value_regex = r'\d+'
 
     @action(detail=True, methods=['post'])
     def subscribe(self, request, pk=None):
-        follower = request.user
-        author = get_object_or_404(User, pk=pk)
-        if follower == author:
+        if int(pk) == request.user.pk:
             return Response({'errors':
                             'Вы не можете подписаться на себя.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        queryset, created = Subscription.objects.get_or_create(
-            follower=follower, author=author
+        subscription = add_link(
+            Subscription, 'author', pk, follower_id=request.user.pk
         )
-        if not created:
+        if subscription is None:
+            get_object_or_404(User, pk=pk)
             return Response({'errors':
                             'Вы уже подписаны на автора.'},
                             status=status.HTTP_400_BAD_REQUEST)
         serializer = SubscriptionSerializer(
-            queryset, context={'request': request}
+            subscription, context={'request': request}
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def bulk_subscribe(self, request):
+        return self.bulk_links(
+            request, Subscription, 'author', 'follower',
+            forbidden={request.user.pk}
+        )
+
     @subscribe.mapping.delete
     def subscribe_del(self, request, pk=None):
-        follower = request.user
-        author = get_object_or_404(User, pk=pk)
-        subscription = Subscription.objects.filter(
-            follower=follower, author=author
-        )
-        if not subscription.exists():
+        if not remove_link(
+            Subscription, 'author', pk, follower_id=request.user.pk
+        ):
+            get_object_or_404(User, pk=pk)
             return Response({'errors': 'Вы не подписаны на автора.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
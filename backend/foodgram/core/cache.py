@@ -0,0 +1,64 @@
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+GENERATION_KEY = 'api_response_generation'
+CATALOGUE_GENERATION_KEY = 'catalogue_generation'
+
+
+def get_generation(key=GENERATION_KEY):
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(key=GENERATION_KEY):
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def table_version(*models):
+    return tuple(
+        tuple(model.objects.order_by().aggregate(
+            rows=Count('pk'), last=Max('pk')
+        ).values())
+        for model in models
+    )
+
+
+class Snapshot(ABC):
+    generation_key = None
+    models = ()
+
+    def __init__(self):
+        self._version = None
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        bump_generation(self.generation_key)
+
+    def refresh(self):
+        version = (get_generation(self.generation_key),
+                   table_version(*self.models))
+        if self._is_stale(version):
+            with self._lock:
+                if self._is_stale(version):
+                    self._build()
+                    self._version = version
+                    self._built_at = time.monotonic()
+
+    def _is_stale(self, version):
+        return (version != self._version or self._built_at is None
+                or time.monotonic() - self._built_at
+                > settings.SNAPSHOT_MAX_AGE)
+
+    @abstractmethod
+    def _build(self):
+        pass
@@ -1,6 +1,11 @@
 import os
+import re
+import threading
+from collections import OrderedDict
+
 import fpdf
-from foodgram.settings import BASE_DIR
+from fpdf.ttfonts import TTFontFile
+from foodgram.settings import BASE_DIR, PDF_CACHE_SIZE
 
 
 fpdf.set_global("FPDF_CACHE_MODE", 1)
@@ -13,6 +18,48 @@ class Constant:
     DR_FOOTER = 4
 
 
+class FontRegistry:
+    def __init__(self):
+        self._fonts = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        font = self._fonts.get(filename)
+        if font is None:
+            with self._lock:
+                font = self._fonts.get(filename)
+                if font is None:
+                    font = self._fonts[filename] = self._parse(filename)
+        return font
+
+    @staticmethod
+    def _parse(filename):
+        ttf = TTFontFile()
+        ttf.getMetrics(filename)
+        return {
+            'name': re.sub('[ ()]', '', ttf.fullName),
+            'desc': {
+                'Ascent': int(round(ttf.ascent, 0)),
+                'Descent': int(round(ttf.descent, 0)),
+                'CapHeight': int(round(ttf.capHeight, 0)),
+                'Flags': ttf.flags,
+                'FontBBox': '[{} {} {} {}]'.format(
+                    *[int(round(value, 0)) for value in ttf.bbox]
+                ),
+                'ItalicAngle': int(ttf.italicAngle),
+                'StemV': int(round(ttf.stemV, 0)),
+                'MissingWidth': int(round(ttf.defaultWidth, 0)),
+            },
+            'up': round(ttf.underlinePosition),
+            'ut': round(ttf.underlineThickness),
+            'originalsize': os.stat(filename).st_size,
+            'cw': ttf.charWidths,
+        }
+
+
+font_registry = FontRegistry()
+
+
 class PDFMarker(fpdf.FPDF):
     font_regular_name = 'DejaVuSansCondensed.ttf'
     font_regular_family = 'DejaVu'
@@ -52,15 +99,40 @@ class PDFMarker(fpdf.FPDF):
                 200, self.line_height, txt=self.footer_text, ln=1, align='C'
             )
 
+    @classmethod
+    def font_paths(cls):
+        return {
+            cls.font_regular_family: os.path.join(
+                BASE_DIR, cls.font_dir, cls.font_regular_name
+            ),
+            cls.font_bold_family: os.path.join(
+                BASE_DIR, cls.font_dir, cls.font_bold_name
+            ),
+        }
+
     def __pdf_init(self):
-        font_regular = os.path.join(
-            BASE_DIR, self.font_dir, self.font_regular_name
-        )
-        font_bold = os.path.join(BASE_DIR, self.font_dir, self.font_bold_name)
         self.set_auto_page_break(1)
         self.add_page()
-        self.add_font(self.font_regular_family, '', font_regular, uni=True)
-        self.add_font(self.font_bold_family, '', font_bold, uni=True)
+        for family, filename in self.font_paths().items():
+            self.__add_registered_font(family, filename)
+
+    def __add_registered_font(self, family, filename):
+        fontkey = family.lower()
+        if fontkey in self.fonts:
+            return
+        font = font_registry.get(filename)
+        self.fonts[fontkey] = {
+            'i': len(self.fonts) + 1, 'type': 'TTF',
+            'name': font['name'], 'desc': font['desc'],
+            'up': font['up'], 'ut': font['ut'], 'cw': font['cw'],
+            'ttffile': filename, 'fontkey': fontkey,
+            'subset': list(range(0, 32)), 'unifilename': None,
+        }
+        self.font_files[fontkey] = {
+            'length1': font['originalsize'], 'type': 'TTF',
+            'ttffile': filename
+        }
+        self.font_files[filename] = {'type': 'TTF'}
 
     def __font_size(self, line_type):
         return self.font_sizes.get(line_type, self.default_font_size)
@@ -87,3 +159,34 @@ class PDFMarker(fpdf.FPDF):
 
     def __pdf_output(self):
         return self.output(dest='S').encode('latin1')
+
+
+class RenderCache:
+    def __init__(self, max_entries=PDF_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+            return content
+
+    def set(self, key, content):
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+render_cache = RenderCache()
+
+for font_filename in PDFMarker.font_paths().values():
+    font_registry.get(font_filename)
@@ -0,0 +1,139 @@
+import csv
+import hashlib
+import io
+import json
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+from core import pdf
+
+
+registry = {}
+
+
+def register(renderer_class):
+    registry[renderer_class.format] = renderer_class
+    return renderer_class
+
+
+def renderer_classes():
+    return list(registry.values())
+
+
+def render_to_bytes(format, lines):
+    return b''.join(registry[format]().stream(lines))
+
+
+def content_hash(lines, format):
+    digest = hashlib.sha256(format.encode('utf-8'))
+    for line in lines:
+        digest.update('{name}\t{amount}\t{measurement_unit}\n'.format(
+            **line
+        ).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ShoppingListRenderer(BaseRenderer, ABC):
+    charset = 'utf-8'
+    weak_etag = False
+    title = 'Мой список покупок:'
+    header = ('Наименование', 'Количество', 'Ед.измерения')
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    @property
+    def footer_text(self):
+        return f'Список покупок с сайта {settings.SITE_NAME}'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    @abstractmethod
+    def stream(self, lines):
+        pass
+
+    @staticmethod
+    def format_line(line):
+        return '{name} - {amount}{measurement_unit}'.format(**line)
+
+
+@register
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    weak_etag = True
+    marker_class = pdf.PDFMarker
+
+    def stream(self, lines):
+        key = content_hash(lines, self.format)
+        content = pdf.render_cache.get(key)
+        if content is None:
+            pdf_data = [
+                (pdf.Constant.DT_CAPTION, self.title),
+                (pdf.Constant.DT_EMPTYLINE, '')
+            ]
+            pdf_data.extend(
+                (pdf.Constant.DT_TEXT, self.format_line(line))
+                for line in lines
+            )
+            pdf_obj = self.marker_class()
+            pdf_obj.data = pdf_data
+            pdf_obj.footer_text = self.footer_text
+            content = pdf_obj.pdf_render()
+            pdf.render_cache.set(key, content)
+        yield content
+
+
+@register
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, lines):
+        yield f'{self.title}\n\n'.encode(self.charset)
+        for line in lines:
+            yield f'{self.format_line(line)}\n'.encode(self.charset)
+        yield f'\n{self.footer_text}\n'.encode(self.charset)
+
+
+@register
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, lines):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.header)
+        for line in lines:
+            writer.writerow(
+                (line['name'], line['amount'], line['measurement_unit'])
+            )
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode(self.charset)
+
+
+@register
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, lines):
+        yield b'['
+        for index, line in enumerate(lines):
+            separator = ',' if index else ''
+            yield (separator + json.dumps(
+                line, ensure_ascii=False
+            )).encode(self.charset)
+        yield b']'
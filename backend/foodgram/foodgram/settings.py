@@ -16,8 +16,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'recipes',
-    'users',
+    'recipes.apps.RecipesConfig',
+    'users.apps.UsersConfig',
     'django_extensions',
     'api',
     'rest_framework',
@@ -66,7 +66,10 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'TEST': {
+            'NAME': os.getenv('DB_TEST_NAME'),
+        },
     }
 }
 
@@ -95,6 +98,15 @@ USE_L10N = True
 
 USE_TZ = False
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
@@ -104,8 +116,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'users.authentication.CachingTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
@@ -128,3 +139,33 @@ DJOSER = {
 }
 
 SITE_NAME = 'http://51.250.73.251/'
+
+PDF_CACHE_SIZE = 128
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+SNAPSHOT_MAX_AGE = 60
+
+RECIPE_SEARCH_LIMIT = 1000
+
+API_CACHE_TIMEOUT = 60
+
+API_CACHE_MAX_AGE = 0
+
+MAX_IMAGE_UPLOAD_SIZE = 10 * 1024 * 1024
+
+MAX_IMAGE_DIMENSION = 8000
+
+MAX_IMAGE_PIXELS = 40 * 10 ** 6
+
+IMAGE_RENDITION_WORKERS = 2
+
+TRENDING_SIZE = 100
+
+BULK_LINKS_MAX_IDS = 100
+
+TOKEN_CACHE_SIZE = 10000
+
+TOKEN_CACHE_TIMEOUT = 60
+
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', 'False') == 'True'
@@ -1,8 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from api.views import (
-    IngredientViewSet, RecipeViewSet, SubscribeViewSet, SubscriptionViewSet,
-    TagViewSet
+    CatalogueView, IngredientViewSet, RecipeViewSet, SubscribeViewSet,
+    SubscriptionViewSet, TagViewSet
 )
 from rest_framework import routers
 from django.conf import settings
@@ -23,6 +23,10 @@ urlpatterns = [
     path('api/users/subscriptions/', SubscriptionViewSet.as_view(
         {'get': 'list'}
     )),
+    path('api/users/subscribe/', SubscribeViewSet.as_view(
+        {'post': 'bulk_subscribe'}
+    )),
+    path('api/catalogue/', CatalogueView.as_view()),
     path('api/', include('djoser.urls')),
     re_path(r'^api/auth/', include('djoser.urls.authtoken')),
     path('api/', include(router.urls)),
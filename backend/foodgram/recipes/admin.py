@@ -1,9 +1,10 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 
+from .images import rendition_urls, schedule_renditions
 from .models import (
     Favorite, Ingredient, IngredientRecipe, Recipe,
-    ShoppingCart, Subscription, Tag
+    ShoppingCart, ShoppingListExport, ShoppingListItem, Subscription, Tag
 )
 
 
@@ -18,27 +19,44 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = [IngredientRecipeInline]
     list_display = (
         'pk', 'name', 'get_html_photo', 'author', 'display_tag',
-        'favorite', 'created'
+        'favorites_count', 'in_carts_count', 'created'
     )
     fields = (
         'name', 'author', 'image', 'get_html_photo', 'text', 'tags',
-        'cooking_time', 'favorite'
+        'cooking_time', 'favorites_count', 'in_carts_count'
+    )
+    readonly_fields = (
+        'get_html_photo', 'favorites_count', 'in_carts_count', 'display_tag'
     )
-    readonly_fields = ('get_html_photo', 'favorite', 'display_tag')
     list_filter = ('name', 'author', 'tags',)
     filter_horizontal = ('tags',)
     save_on_top = True
 
     def get_html_photo(self, object):
+        if object.image and object.has_renditions:
+            url = rendition_urls(object.image.name)['small']['jpeg']
+            return mark_safe(f"<img src='{url}' width=50>")
         if object.image:
             return mark_safe(f"<img src='{object.image.url}' width=50>")
 
-    get_html_photo.short_description = "Миниатюра"
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            schedule_renditions(obj)
 
-    def favorite(self, object):
-        return object.favorites.count()
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change and any(formset.has_changed() for formset in formsets):
+            ShoppingListItem.rebuild(ShoppingCart.objects.filter(
+                recipe=form.instance
+            ).values_list('user_id', flat=True))
+
+    get_html_photo.short_description = "Миниатюра"
 
-    favorite.short_description = "Раз в избранном"
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related('tags')
 
     def display_tag(self, object):
         return ', '.join([tag.name for tag in object.tags.all()])
@@ -80,3 +98,10 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ['pk', 'user', 'recipe', 'created']
     readonly_fields = ('created',)
     list_filter = ('user', 'recipe')
+
+
+@admin.register(ShoppingListExport)
+class ShoppingListExportAdmin(admin.ModelAdmin):
+    list_display = ['pk', 'user', 'format', 'status', 'created']
+    readonly_fields = ('created',)
+    list_filter = ('status', 'format')
@@ -0,0 +1,48 @@
+import bisect
+
+from core.cache import Snapshot
+from recipes.models import Ingredient
+
+
+class IngredientIndex(Snapshot):
+    generation_key = 'ingredient_index_version'
+    models = (Ingredient,)
+
+    def __init__(self):
+        super().__init__()
+        self._index = ([], [])
+
+    def search(self, query, limit):
+        self.refresh()
+        keys, items = self._index
+        query = query.strip().casefold()
+        start = bisect.bisect_left(keys, query)
+        result = []
+        index = start
+        while (index < len(keys) and len(result) < limit
+               and keys[index].startswith(query)):
+            result.append(items[index])
+            index += 1
+        prefix_end = index
+        for index, key in enumerate(keys):
+            if len(result) >= limit:
+                break
+            if start <= index < prefix_end:
+                continue
+            if query in key and not key.startswith(query):
+                result.append(items[index])
+        return result
+
+    def _build(self):
+        rows = sorted(
+            Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'
+            ).order_by(),
+            key=lambda row: (
+                row['name'].casefold(), row['measurement_unit'], row['id']
+            )
+        )
+        self._index = ([row['name'].casefold() for row in rows], rows)
+
+
+ingredient_index = IngredientIndex()
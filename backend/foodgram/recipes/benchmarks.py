@@ -0,0 +1,181 @@
+import statistics
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.models import (Ingredient, IngredientRecipe, Recipe, Subscription,
+                            Tag)
+from recipes.search import update_search_index
+from users.models import User
+
+SEED_PREFIX = 'bench_'
+BATCH_SIZE = 1000
+SPREAD_STEP = 100
+DISHES = (
+    'суп', 'борщ', 'салат', 'пирог', 'омлет', 'каша', 'рагу', 'плов',
+    'запеканка', 'котлеты', 'блины', 'сырники', 'паста', 'гуляш', 'шарлотка',
+)
+ADJECTIVES = (
+    'домашний', 'быстрый', 'летний', 'острый', 'постный', 'праздничный',
+    'сытный', 'лёгкий', 'пряный', 'деревенский',
+)
+PRODUCTS = (
+    'курица', 'говядина', 'свинина', 'лосось', 'картофель', 'морковь',
+    'лук', 'чеснок', 'томат', 'сыр', 'творог', 'молоко', 'яйцо', 'мука',
+    'рис', 'гречка', 'фасоль', 'грибы', 'перец', 'яблоко', 'тыква',
+)
+
+Dataset = namedtuple('Dataset', 'users tags ingredients recipes')
+
+
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def analyze():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def capture_queries():
+    reset_queries()
+    return CaptureQueriesContext(connection)
+
+
+def bulk_insert(model, objects):
+    objects = iter(objects)
+    batch = list(islice(objects, BATCH_SIZE))
+    while batch:
+        model.objects.bulk_create(batch)
+        batch = list(islice(objects, BATCH_SIZE))
+
+
+def seed_recipes(size, rng, users=None, prefix=SEED_PREFIX):
+    bulk_insert(User, (
+        User(
+            username=f'{prefix}{number}',
+            email=f'{prefix}{number}@example.com',
+            first_name='Тест', last_name='Тестов'
+        )
+        for number in range(users or max(size // 4, 2))
+    ))
+    user_ids = list(User.objects.filter(
+        username__startswith=prefix
+    ).values_list('pk', flat=True))
+    Tag.objects.bulk_create([
+        Tag(name=f'Тег {number}', slug=f'{prefix}{number}')
+        for number in range(10)
+    ])
+    tags = list(Tag.objects.filter(
+        slug__startswith=prefix
+    ).values_list('pk', 'slug'))
+    bulk_insert(Ingredient, (
+        Ingredient(
+            name=f'{prefix}{number} {rng.choice(PRODUCTS)}',
+            measurement_unit='г'
+        )
+        for number in range(max(size // 10, 5))
+    ))
+    ingredient_ids = list(Ingredient.objects.filter(
+        name__startswith=prefix
+    ).values_list('pk', flat=True))
+    bulk_insert(Recipe, (
+        Recipe(
+            author_id=user_ids[number % len(user_ids)],
+            name=(f'{prefix}{number} {rng.choice(ADJECTIVES)} '
+                  f'{rng.choice(DISHES)}'),
+            image='recipes/images/bench.jpg',
+            text=' '.join(rng.choices(PRODUCTS + DISHES, k=12)),
+            cooking_time=rng.randint(1, 600),
+            favorites_count=rng.randint(0, 100)
+        )
+        for number in range(size)
+    ))
+    recipe_ids = list(Recipe.objects.filter(
+        name__startswith=prefix
+    ).values_list('pk', flat=True))
+    bulk_insert(Recipe.tags.through, (
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id, _ in rng.sample(tags, 2)
+    ))
+    bulk_insert(IngredientRecipe, (
+        IngredientRecipe(
+            recipes_id=recipe_id, ingredients_id=ingredient_id,
+            amount=rng.randint(1, 500)
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in rng.sample(ingredient_ids, 5)
+    ))
+    for start in range(0, len(recipe_ids), BATCH_SIZE // 2):
+        update_search_index(recipe_ids[start:start + BATCH_SIZE // 2])
+    return Dataset(user_ids, tags, ingredient_ids, recipe_ids)
+
+
+def seed_links(model, dataset, per_user, rng, spread=None):
+    now = timezone.now()
+    per_user = min(per_user, len(dataset.recipes))
+    batch = []
+    for user_id in dataset.users:
+        batch.extend(
+            model(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in rng.sample(dataset.recipes, per_user)
+        )
+        if len(batch) >= BATCH_SIZE:
+            insert_links(model, batch, now, spread, rng)
+            batch = []
+    insert_links(model, batch, now, spread, rng)
+
+
+def insert_links(model, batch, now, spread, rng):
+    last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    model.objects.bulk_create(batch)
+    if not spread:
+        return
+    for start in range(last, last + len(batch), SPREAD_STEP):
+        model.objects.filter(
+            pk__gt=start, pk__lte=start + SPREAD_STEP
+        ).update(created=now - spread * rng.random())
+
+
+def seed_subscriptions(dataset, per_user, rng):
+    per_user = min(per_user, len(dataset.users))
+    bulk_insert(Subscription, (
+        Subscription(follower_id=user_id, author_id=author_id)
+        for user_id in dataset.users
+        for author_id in rng.sample(dataset.users, per_user)
+        if author_id != user_id
+    ))
+
+
+def make_view(viewset, user, params, action='list'):
+    request = Request(APIRequestFactory().get('/', params))
+    request.user = user
+    return viewset(
+        request=request, format_kwarg=None, action=action, kwargs={}
+    )
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def describe(timings):
+    return (f'медиана {statistics.median(timings) * 1000:.1f} мс, '
+            f'минимум {min(timings) * 1000:.1f} мс')
@@ -1,14 +1,22 @@
 from django_filters.rest_framework import filters, FilterSet
-from recipes.models import Recipe
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
+from users.models import User
 
 
 class RecipeFilter(FilterSet):
-    author = filters.AllValuesMultipleFilter(field_name='author__id')
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    author = filters.ModelMultipleChoiceFilter(
+        field_name='author', queryset=User.objects.all()
+    )
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug', to_field_name='slug',
+        queryset=Tag.objects.all()
+    )
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -20,6 +28,11 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
 
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
-        fields = ['is_favorited', 'is_in_shopping_cart', 'author', 'tags', ]
+        fields = [
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags', 'search'
+        ]
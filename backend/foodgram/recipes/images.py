@@ -0,0 +1,107 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from core.cache import bump_generation
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
+RENDITION_DIR = 'recipes/renditions/'
+RENDITION_SIZES = {
+    'small': 300,
+    'medium': 800,
+}
+RENDITION_FORMATS = {
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+_executor = None
+
+
+def rendition_name(image_name, size, format):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{RENDITION_DIR}{stem}_{size}.{format}'
+
+
+def rendition_urls(image_name):
+    return {
+        size: {
+            format: default_storage.url(
+                rendition_name(image_name, size, format)
+            )
+            for format in RENDITION_FORMATS
+        }
+        for size in RENDITION_SIZES
+    }
+
+
+def generate_renditions(image_name):
+    with default_storage.open(image_name, 'rb') as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+    for size, max_side in RENDITION_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((max_side, max_side), Image.LANCZOS)
+        for format, (pil_format, options) in RENDITION_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = rendition_name(image_name, size, format)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def process_recipe_image(recipe_id):
+    try:
+        image_name = Recipe.objects.filter(
+            pk=recipe_id
+        ).values_list('image', flat=True).first()
+        if not image_name:
+            return
+        generate_renditions(image_name)
+        if Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            has_renditions=True
+        ):
+            bump_generation()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception('Не удалось обработать фото рецепта %s', recipe_id)
+
+
+def _process_in_worker(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_RENDITION_WORKERS,
+            thread_name_prefix='renditions'
+        )
+    return _executor
+
+
+def schedule_renditions(recipe):
+    Recipe.objects.filter(pk=recipe.pk).update(has_renditions=False)
+    recipe.has_renditions = False
+    if settings.IMAGE_RENDITION_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(_process_in_worker, recipe.pk)
+        )
+    else:
+        transaction.on_commit(lambda: process_recipe_image(recipe.pk))
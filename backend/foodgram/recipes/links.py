@@ -0,0 +1,86 @@
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+links_added = Signal()
+links_removed = Signal()
+
+
+def add_links(model, target_field, target_ids, **values):
+    target_ids = list(target_ids)
+    if not target_ids:
+        return []
+    quote = connection.ops.quote_name
+    target = model._meta.get_field(target_field)
+    target_meta = target.remote_field.model._meta
+    target_pk = (
+        f'{quote(target_meta.db_table)}.{quote(target_meta.pk.column)}'
+    )
+    now = timezone.now()
+    columns, selected, params = [], [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        columns.append(quote(field.column))
+        if field is target:
+            selected.append(target_pk)
+            continue
+        if getattr(field, 'auto_now_add', False):
+            values[field.attname] = now
+        selected.append('%s')
+        params.append(
+            field.get_db_prep_value(values[field.attname], connection)
+        )
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(columns)}) '
+        f'SELECT {", ".join(selected)} FROM {quote(target_meta.db_table)} '
+        f'WHERE {target_pk} IN ({placeholders}) '
+        f'ON CONFLICT DO NOTHING '
+        f'RETURNING {quote(model._meta.pk.column)}, {quote(target.column)}'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, params + target_ids)
+        instances = [
+            model(pk=pk, **{target.attname: target_id}, **values)
+            for pk, target_id in cursor.fetchall()
+        ]
+        if instances:
+            links_added.send(sender=model, instances=instances)
+    return instances
+
+
+def add_link(model, target_field, target_id, **values):
+    instances = add_links(model, target_field, [target_id], **values)
+    return instances[0] if instances else None
+
+
+def remove_links(model, target_field, target_ids, **values):
+    target_ids = list(target_ids)
+    if not target_ids:
+        return []
+    quote = connection.ops.quote_name
+    target = model._meta.get_field(target_field)
+    where = ' AND '.join(
+        f'{quote(model._meta.get_field(name).column)} = %s'
+        for name in values
+    )
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    sql = (
+        f'DELETE FROM {quote(model._meta.db_table)} '
+        f'WHERE {where} AND {quote(target.column)} IN ({placeholders}) '
+        f'RETURNING {quote(model._meta.pk.column)}, {quote(target.column)}'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, list(values.values()) + target_ids)
+        instances = [
+            model(pk=pk, **{target.attname: target_id}, **values)
+            for pk, target_id in cursor.fetchall()
+        ]
+        if instances:
+            links_removed.send(sender=model, instances=instances)
+    return instances
+
+
+def remove_link(model, target_field, target_id, **values):
+    return bool(remove_links(model, target_field, [target_id], **values))
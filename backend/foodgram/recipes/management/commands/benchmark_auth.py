@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.views import TagViewSet
+from recipes.benchmarks import capture_queries, rolled_back
+from users.authentication import CachingTokenAuthentication, token_cache
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность авторизованных запросов к '
+            '/api/tags/ с кэшем токенов и без него')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Количество запросов в каждом замере'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'База: {connection.vendor}')
+        with rolled_back():
+            user = User.objects.create_user(
+                username='bench_auth', email='bench_auth@example.com',
+                password='bench_auth'
+            )
+            token = Token.objects.create(user=user)
+            for authentication in (TokenAuthentication,
+                                   CachingTokenAuthentication):
+                token_cache.invalidate(token.key)
+                self.benchmark(
+                    authentication, token.key, options['requests']
+                )
+
+    def benchmark(self, authentication, key, requests):
+        view = TagViewSet.as_view(
+            {'get': 'list'}, authentication_classes=(authentication,)
+        )
+        factory = APIRequestFactory()
+
+        def call():
+            response = view(factory.get(
+                '/api/tags/', HTTP_AUTHORIZATION=f'Token {key}'
+            )).render()
+            if response.status_code != 200:
+                raise CommandError(
+                    f'Ответ {response.status_code}: {response.content}'
+                )
+
+        call()
+        with capture_queries() as queries:
+            call()
+        started = time.perf_counter()
+        for _ in range(requests):
+            call()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{authentication.__name__}: {requests / elapsed:.0f} запр/с, '
+            f'запросов к базе на вызов: {len(queries)}'
+        )
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from core import pdf
+from core.renderers import PDFShoppingListRenderer
+from recipes.benchmarks import describe, measure
+
+
+class ParsingPDFMarker(pdf.PDFMarker):
+    def _PDFMarker__add_registered_font(self, family, filename):
+        self.add_font(family, '', filename, uni=True)
+
+
+class ParsingPDFRenderer(PDFShoppingListRenderer):
+    marker_class = ParsingPDFMarker
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время формирования PDF списка покупок с разбором '
+            'шрифтов в каждом документе и с общим реестром шрифтов')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines', type=int, default=50,
+            help='Количество строк в списке покупок'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество замеров'
+        )
+
+    def handle(self, *args, **options):
+        lines = [
+            {
+                'name': f'Ингредиент {number}', 'amount': number * 10,
+                'measurement_unit': 'г'
+            }
+            for number in range(1, options['lines'] + 1)
+        ]
+        for name, renderer_class in (
+            ('add_font в каждом документе', ParsingPDFRenderer),
+            ('FontRegistry', PDFShoppingListRenderer),
+        ):
+            def render():
+                pdf.render_cache.clear()
+                return b''.join(renderer_class().stream(lines))
+
+            self.stdout.write(
+                f'{name}: {describe(measure(render, options["repeat"]))}'
+            )
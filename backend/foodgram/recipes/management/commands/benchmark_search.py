@@ -0,0 +1,84 @@
+import random
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from api.views import RecipeViewSet
+from recipes.benchmarks import (analyze, describe, make_view, measure,
+                                rolled_back, seed_recipes)
+from recipes.paginators import CustomPagination
+from recipes.search import search_recipes
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими рецептами и замеряет поиск '
+            '/api/recipes/?search= в сравнении с icontains. Тестовые данные '
+            'не сохраняются')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=100000,
+            help='Количество тестовых рецептов'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Количество замеров каждого запроса'
+        )
+        parser.add_argument(
+            '--query', action='append', dest='queries',
+            help='Поисковый запрос, можно указать несколько раз'
+        )
+
+    def handle(self, *args, **options):
+        if options['recipes'] < 10:
+            raise CommandError('--recipes должен быть не меньше 10')
+        queries = options['queries'] or [
+            'борщ', 'курица', 'домашний пирог', 'тыкв', 'bench_4242',
+            'нет такого'
+        ]
+        self.stdout.write(
+            f'База: {connection.vendor}, рецептов: {options["recipes"]}'
+        )
+        with rolled_back():
+            seed_recipes(options['recipes'], random.Random(0))
+            analyze()
+            for query in queries:
+                self.benchmark(query, options['repeat'])
+
+    def benchmark(self, query, repeat):
+        view = make_view(RecipeViewSet, AnonymousUser(), {'search': query})
+        page_size = CustomPagination.page_size
+
+        def page(queryset):
+            return queryset.count(), list(queryset[:page_size])
+
+        def search_page():
+            return page(search_recipes(view.get_queryset(), query))
+
+        def icontains_page():
+            return page(view.get_queryset().filter(
+                Q(name__icontains=query) | Q(text__icontains=query)
+            ))
+
+        def endpoint_page():
+            return page(view.filter_queryset(view.get_queryset()))
+
+        with CaptureQueriesContext(connection) as queries:
+            count, _ = endpoint_page()
+        capped = (connection.vendor == 'sqlite'
+                  and count >= settings.RECIPE_SEARCH_LIMIT)
+        self.stdout.write(
+            f'«{query}»: найдено {count}'
+            + (' (ограничено RECIPE_SEARCH_LIMIT)' if capped else '')
+            + f', запросов {len(queries)}'
+        )
+        for name, func in (('search', search_page),
+                           ('icontains', icontains_page),
+                           ('RecipeFilter', endpoint_page)):
+            self.stdout.write(
+                f'   {name + ":":<14}{describe(measure(func, repeat))}'
+            )
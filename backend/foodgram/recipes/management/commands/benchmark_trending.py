@@ -0,0 +1,96 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from recipes.benchmarks import (analyze, capture_queries, describe, measure,
+                                rolled_back, seed_links, seed_recipes)
+from recipes.models import Favorite, RecipeRanking, ShoppingCart
+from recipes.trending import WINDOWS, refresh_rankings
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими избранными и списками покупок, '
+            'замеряет пересчёт рейтингов и /api/recipes/trending/ в '
+            'сравнении с подсчётом на лету. Тестовые данные не сохраняются')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--favorites', type=int, default=2000000,
+            help='Количество тестовых записей избранного'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=20000,
+            help='Количество тестовых рецептов'
+        )
+        parser.add_argument(
+            '--per-user', type=int, default=20,
+            help='Записей избранного у одного пользователя'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Количество замеров каждого запроса'
+        )
+
+    def handle(self, *args, **options):
+        per_user = options['per_user']
+        if options['recipes'] < per_user:
+            raise CommandError('--recipes должен быть не меньше --per-user')
+        users = max(options['favorites'] // per_user, 2)
+        longest = max(length for length, _ in WINDOWS.values())
+        with rolled_back():
+            rng = random.Random(0)
+            dataset = seed_recipes(options['recipes'], rng, users=users)
+            seed_links(Favorite, dataset, per_user, rng, spread=longest)
+            seed_links(
+                ShoppingCart, dataset, max(per_user // 4, 1), rng,
+                spread=longest
+            )
+            analyze()
+            self.stdout.write(
+                f'База: {connection.vendor}, '
+                f'избранного: {Favorite.objects.count()}, '
+                f'в списках покупок: {ShoppingCart.objects.count()}, '
+                f'рецептов: {len(dataset.recipes)}'
+            )
+            self.benchmark(
+                User.objects.get(pk=dataset.users[0]), options['repeat']
+            )
+
+    def benchmark(self, user, repeat):
+        view = RecipeViewSet.as_view({'get': 'trending'})
+
+        def trending_page():
+            request = APIRequestFactory().get(
+                '/api/recipes/trending/', {'window': RecipeRanking.DAY}
+            )
+            force_authenticate(request, user)
+            return view(request).render()
+
+        def live_top():
+            return list(Favorite.objects.filter(
+                created__gte=timezone.now() - timedelta(hours=24)
+            ).values('recipe').annotate(
+                total=Count('pk')
+            ).order_by('-total')[:settings.TRENDING_SIZE])
+
+        refresh_rankings()
+        with capture_queries() as queries:
+            results = trending_page().data['results']
+        if not results:
+            raise CommandError('Рейтинг за 24 ч пуст, увеличьте --favorites')
+        for name, func in (
+            ('refresh_trending', refresh_rankings),
+            (f'trending, запросов {len(queries)}', trending_page),
+            ('топ за 24 ч на лету', live_top),
+        ):
+            self.stdout.write(
+                f'   {name + ":":<24}{describe(measure(func, repeat))}'
+            )
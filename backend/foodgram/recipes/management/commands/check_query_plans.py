@@ -0,0 +1,153 @@
+import random
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from djoser.views import UserViewSet
+
+from api.views import IngredientViewSet, RecipeViewSet, SubscriptionViewSet
+from recipes.autocomplete import ingredient_index
+from recipes.benchmarks import (analyze, make_view, rolled_back, seed_links,
+                                seed_recipes, seed_subscriptions)
+from recipes.models import (Favorite, Ingredient, RecipeRanking, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.paginators import CustomPagination
+from recipes.trending import refresh_rankings
+from users.models import User
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)$')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (?P<table>\w+)')
+LOOKUP_TABLES = {Tag._meta.db_table, Ingredient._meta.db_table}
+SEED_PREFIX = 'plan_check_'
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу тестовыми данными, проверяет планы запросов '
+            'списков и фильтров API и завершается ошибкой при полном '
+            'сканировании таблицы. Тестовые данные не сохраняются')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=2000,
+            help='Количество тестовых рецептов'
+        )
+
+    def handle(self, *args, **options):
+        if options['recipes'] < 10:
+            raise CommandError('--recipes должен быть не меньше 10')
+        with rolled_back():
+            user, author, tags = self.seed(options['recipes'])
+            analyze()
+            failures = self.check_plans(user, author, tags)
+        if failures:
+            raise CommandError(
+                'Полное сканирование таблиц:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Полных сканирований нет'))
+
+    def seed(self, size):
+        rng = random.Random(0)
+        dataset = seed_recipes(size, rng, prefix=SEED_PREFIX)
+        seed_links(Favorite, dataset, 10, rng)
+        seed_links(ShoppingCart, dataset, 3, rng)
+        seed_subscriptions(dataset, 5, rng)
+        ShoppingListItem.rebuild(dataset.users)
+        refresh_rankings()
+        user = User.objects.get(pk=dataset.users[0])
+        return user, dataset.users[1], [slug for _, slug in dataset.tags[:2]]
+
+    def check_plans(self, user, author_id, tags):
+        failures = []
+        for name, evaluate in self.get_checks(user, author_id, tags):
+            with CaptureQueriesContext(connection) as queries:
+                evaluate()
+            for number, query in enumerate(queries.captured_queries, 1):
+                if not query['sql'].lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = self.explain(query['sql'])
+                scans = self.full_scans(plan) - LOOKUP_TABLES
+                self.stdout.write(f'== {name}, запрос {number}')
+                for line in plan:
+                    self.stdout.write(f'   {line}')
+                if scans:
+                    failures.append(
+                        f'{name}, запрос {number}: {", ".join(sorted(scans))}'
+                    )
+        return failures
+
+    def get_checks(self, user, author_id, tags):
+        anonymous = AnonymousUser()
+        return (
+            ('Лента рецептов, аноним',
+             self.recipe_list(anonymous, {})),
+            ('Лента рецептов',
+             self.recipe_list(user, {})),
+            ('Рецепты по тегам',
+             self.recipe_list(user, {'tags': tags})),
+            ('Рецепты автора',
+             self.recipe_list(user, {'author': author_id})),
+            ('Избранные рецепты',
+             self.recipe_list(user, {'is_favorited': '1'})),
+            ('Рецепты в списке покупок',
+             self.recipe_list(user, {'is_in_shopping_cart': '1'})),
+            ('Популярные рецепты',
+             self.recipe_list(user, {'ordering': '-favorites_count'})),
+            ('Поиск рецептов',
+             self.recipe_list(user, {'search': 'домашний пирог'})),
+            ('Рецепты в тренде',
+             self.trending(user, RecipeRanking.WEEK)),
+            ('Список пользователей',
+             self.view_page(UserViewSet, user, {})),
+            ('Список ингредиентов',
+             self.view_page(IngredientViewSet, anonymous, {})),
+            ('Поиск ингредиентов',
+             self.ingredient_search('картофель')),
+            ('Подписки пользователя',
+             self.view_page(SubscriptionViewSet, user, {'recipes_limit': 3})),
+            ('Сохранённый список покупок',
+             lambda: ShoppingCart.get_shopping_list(user)),
+        )
+
+    def recipe_list(self, user, params):
+        return self.view_page(RecipeViewSet, user, params)
+
+    def trending(self, user, window):
+        view = make_view(RecipeViewSet, user, {}, action='trending')
+        return lambda: list(
+            view.get_trending_queryset(window)[:CustomPagination.page_size]
+        )
+
+    def ingredient_search(self, name):
+        def search():
+            ingredient_index.invalidate()
+            return ingredient_index.search(name, 10)
+        return search
+
+    def view_page(self, viewset, user, params):
+        view = make_view(viewset, user, params)
+        return lambda: list(view.filter_queryset(
+            view.get_queryset()
+        )[:CustomPagination.page_size])
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                return [row[0] for row in cursor.fetchall()]
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [row[-1] for row in cursor.fetchall()]
+        raise CommandError(
+            f'База данных {connection.vendor} не поддерживается'
+        )
+
+    def full_scans(self, plan):
+        pattern = (POSTGRES_FULL_SCAN if connection.vendor == 'postgresql'
+                   else SQLITE_FULL_SCAN)
+        return {
+            match.group('table') for match in map(pattern.search, plan)
+            if match
+        }
@@ -0,0 +1,95 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core import renderers
+from recipes.models import ShoppingCart, ShoppingListExport
+
+
+class Command(BaseCommand):
+    help = 'Формирует файлы отложенных выгрузок списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Количество процессов для формирования файлов'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, ожидая новые выгрузки'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между проверками очереди в режиме --loop, сек'
+        )
+        parser.add_argument(
+            '--claim-timeout', type=float, default=300.0,
+            help=('Через сколько секунд выгрузку, зависшую в обработке, '
+                  'можно взять в работу повторно')
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        self.claim_timeout = timedelta(seconds=options['claim_timeout'])
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                processed = self.drain(executor, workers)
+                if processed:
+                    self.stdout.write(f'Обработано выгрузок: {processed}')
+                if not options['loop']:
+                    break
+                if not processed:
+                    time.sleep(options['interval'])
+
+    def drain(self, executor, batch_size):
+        processed = 0
+        while True:
+            exports = self.claim(batch_size)
+            if not exports:
+                return processed
+            futures = [
+                (export, executor.submit(
+                    renderers.render_to_bytes,
+                    export.format,
+                    ShoppingCart.get_shopping_list(export.user)
+                ))
+                for export in exports
+            ]
+            for export, future in futures:
+                try:
+                    content = future.result()
+                except Exception as error:
+                    export.status = ShoppingListExport.FAILED
+                    export.error = str(error)
+                else:
+                    export.file.save(
+                        f'shoppingcart.{export.format}',
+                        ContentFile(content),
+                        save=False
+                    )
+                    export.status = ShoppingListExport.DONE
+                export.save(update_fields=('status', 'file', 'error'))
+            processed += len(exports)
+
+    def claim(self, limit):
+        now = timezone.now()
+        claimable = ShoppingListExport.objects.filter(
+            Q(status=ShoppingListExport.PENDING)
+            | Q(status=ShoppingListExport.PROCESSING)
+            & (Q(claimed_at__lt=now - self.claim_timeout)
+               | Q(claimed_at__isnull=True))
+        )
+        claimed = [
+            pk for pk in claimable.values_list('pk', flat=True)[:limit]
+            if claimable.filter(pk=pk).update(
+                status=ShoppingListExport.PROCESSING, claimed_at=now
+            )
+        ]
+        return list(ShoppingListExport.objects.filter(
+            pk__in=claimed
+        ).select_related('user'))
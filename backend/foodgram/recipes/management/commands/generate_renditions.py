@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры и WebP-версии фото рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать миниатюры для всех рецептов'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(has_renditions=False)
+        recipe_ids = list(recipes.values_list('pk', flat=True))
+        for recipe_id in recipe_ids:
+            process_recipe_image(recipe_id)
+        ready = Recipe.objects.filter(
+            pk__in=recipe_ids, has_renditions=True
+        ).count()
+        self.stdout.write(
+            f'Обработано фото: {ready} из {len(recipe_ids)}'
+        )
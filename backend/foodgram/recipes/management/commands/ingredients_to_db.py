@@ -1,26 +1,94 @@
 import codecs
 import csv
-from django.core.management.base import BaseCommand
-from django.db.utils import IntegrityError
+import json
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.cache import CATALOGUE_GENERATION_KEY, bump_generation
+from recipes.autocomplete import ingredient_index
 from recipes.models import Ingredient
 
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON файла'
 
     filename = 'ingredients.csv'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=f'../../data/{self.filename}',
+            help='Путь к файлу ingredients.csv или ingredients.json'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество строк в одном INSERT'
+        )
+
     def handle(self, *args, **options):
-        with codecs.open(
-            f'../../data/{self.filename}', 'r', encoding='utf-8'
-        ) as file:
-            csv_reader = csv.reader(file)
-            for row in csv_reader:
-                try:
-                    Ingredient.objects.create(
-                        name=row[0], measurement_unit=row[1]
+        path = options['path']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        name_length = Ingredient._meta.get_field('name').max_length
+        unit_length = Ingredient._meta.get_field(
+            'measurement_unit'
+        ).max_length
+        processed = inserted = skipped = invalid = 0
+        seen = set()
+        with transaction.atomic():
+            rows = self.read_rows(path)
+            while True:
+                chunk = list(islice(rows, batch_size))
+                if not chunk:
+                    break
+                processed += len(chunk)
+                keys = []
+                for name, measurement_unit in chunk:
+                    if (not name or not measurement_unit
+                            or len(name) > name_length
+                            or len(measurement_unit) > unit_length):
+                        invalid += 1
+                    elif (name, measurement_unit) in seen:
+                        skipped += 1
+                    else:
+                        seen.add((name, measurement_unit))
+                        keys.append((name, measurement_unit))
+                existing = set(Ingredient.objects.filter(
+                    name__in={name for name, _ in keys}
+                ).values_list('name', 'measurement_unit'))
+                new = [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in keys
+                    if (name, measurement_unit) not in existing
+                ]
+                Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+                inserted += len(new)
+                skipped += len(keys) - len(new)
+                self.stdout.write(f'Обработано строк: {processed}')
+        if inserted:
+            ingredient_index.invalidate()
+            bump_generation()
+            bump_generation(CATALOGUE_GENERATION_KEY)
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные из {path} загружены: добавлено {inserted}, '
+            f'пропущено {skipped}, с ошибками {invalid}'
+        ))
+
+    def read_rows(self, path):
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден')
+        with codecs.open(path, 'r', encoding='utf-8') as file:
+            if os.path.splitext(path)[1].lower() == '.json':
+                for item in json.load(file):
+                    yield (
+                        str(item.get('name', '')).strip(),
+                        str(item.get('measurement_unit', '')).strip()
                     )
-                except (ValueError):
-                    pass
-                except (IntegrityError):
-                    pass
-            self.stdout.write(f'Данные из {self.filename} загружены')
+            else:
+                for row in csv.reader(file):
+                    if len(row) != 2:
+                        yield '', ''
+                        continue
+                    yield row[0].strip(), row[1].strip()
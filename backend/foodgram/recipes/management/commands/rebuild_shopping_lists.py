@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает сохранённые списки покупок и сверяет их '
+            'с рецептами в корзинах')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сверить списки, не пересобирая их'
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Обработать только пользователя с этим id'
+        )
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if not options['check']:
+            created = ShoppingListItem.rebuild(users)
+            self.stdout.write(f'Создано позиций: {created}')
+        mismatches = ShoppingListItem.verify(users)
+        for (user_id, ingredient_id), expected, actual in mismatches:
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидалось {expected}, сохранено {actual}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Списки покупок совпадают'))
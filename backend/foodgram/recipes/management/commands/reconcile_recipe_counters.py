@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного и списков покупок '
+            'у рецептов')
+
+    def handle(self, *args, **options):
+        drifted = Recipe.reconcile_counters()
+        if drifted:
+            self.stdout.write(
+                'Исправлены счётчики рецептов: '
+                + ', '.join(str(pk) for pk in drifted)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики сверены, исправлено рецептов: {len(drifted)}'
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.trending import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярных рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, default=None,
+            help='Количество рецептов в рейтинге каждого периода'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, пересчитывая рейтинги по расписанию'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=600.0,
+            help='Пауза между пересчётами в режиме --loop, сек'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            rankings = refresh_rankings(size=options['size'])
+            self.stdout.write(
+                f'Рейтинги пересчитаны: {len(rankings)} строк '
+                f'за {time.monotonic() - started:.2f} с'
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.19 on 2026-10-18 02:47
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        min_pk=models.Min('pk'), total=models.Count('pk')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']
+        ).exclude(pk=duplicate['min_pk'])
+        IngredientRecipe.objects.filter(ingredients__in=extra).update(
+            ingredients=duplicate['min_pk']
+        )
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_shoppinglistexport'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='name_measurement_unit'),
+        ),
+    ]
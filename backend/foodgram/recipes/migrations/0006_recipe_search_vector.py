@@ -0,0 +1,72 @@
+# Generated by Django 2.2.19 on 2026-10-18 02:49
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRES_BACKFILL_SQL = '''
+    UPDATE recipes_recipe SET search_vector =
+        setweight(to_tsvector(%s, coalesce(recipes_recipe.name, '')), 'A')
+        || setweight(to_tsvector(%s, coalesce((
+            SELECT string_agg(recipes_ingredient.name, ' ')
+            FROM recipes_ingredientrecipe
+            JOIN recipes_ingredient
+                ON recipes_ingredient.id
+                = recipes_ingredientrecipe.ingredients_id
+            WHERE recipes_ingredientrecipe.recipes_id = recipes_recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector(%s, coalesce(recipes_recipe.text, '')), 'C')
+'''
+
+SQLITE_BACKFILL_SQL = '''
+    INSERT INTO recipes_recipe_fts(rowid, name, ingredients, text)
+    SELECT recipes_recipe.id, recipes_recipe.name, coalesce((
+        SELECT group_concat(recipes_ingredient.name, ' ')
+        FROM recipes_ingredientrecipe
+        JOIN recipes_ingredient
+            ON recipes_ingredient.id = recipes_ingredientrecipe.ingredients_id
+        WHERE recipes_ingredientrecipe.recipes_id = recipes_recipe.id
+    ), ''), recipes_recipe.text
+    FROM recipes_recipe
+'''
+
+
+def forwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipe_search_vector_gin '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        schema_editor.execute(POSTGRES_BACKFILL_SQL, ['russian'] * 3)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts '
+            'USING fts5(name, ingredients, text)'
+        )
+        schema_editor.execute(SQLITE_BACKFILL_SQL)
+
+
+def backwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
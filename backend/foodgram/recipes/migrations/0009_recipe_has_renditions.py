@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2026-10-18 02:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='has_renditions',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Миниатюры готовы'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.19 on 2026-10-18 03:00
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_recipe_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    counters = {
+        'favorites_count': apps.get_model('recipes', 'Favorite'),
+        'in_carts_count': apps.get_model('recipes', 'ShoppingCart'),
+    }
+    Recipe.objects.update(**{
+        field: Coalesce(models.Subquery(
+            model.objects.filter(
+                recipe=models.OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                total=models.Count('pk')
+            ).values('total'),
+            output_field=models.IntegerField()
+        ), 0)
+        for field, model in counters.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recipe',
+            name='is_favorited',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='is_in_shopping_cart',
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Раз в избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Раз в списке покупок'),
+        ),
+        migrations.RunPython(fill_recipe_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-in_carts_count'], name='recipe_in_carts_count_idx'),
+        ),
+    ]
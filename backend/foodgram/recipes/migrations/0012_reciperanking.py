@@ -0,0 +1,45 @@
+# Generated by Django 2.2.19 on 2026-10-18 03:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('24h', 'Сутки'), ('7d', 'Неделя'), ('30d', 'Месяц')], max_length=3, verbose_name='Период')),
+                ('score', models.FloatField(verbose_name='Рейтинг')),
+                ('updated', models.DateTimeField(verbose_name='Дата расчёта')),
+                ('recipe', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='recipes.Recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+                'ordering': ('window', '-score'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['window', '-score'], name='ranking_window_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['created', 'recipe'], name='favorite_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['created', 'recipe'], name='shopping_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reciperanking',
+            constraint=models.UniqueConstraint(fields=('recipe', 'window'), name='recipe_window_ranking'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2026-10-18 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_reciperanking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglistexport',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Взята в работу'),
+        ),
+    ]
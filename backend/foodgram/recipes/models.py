@@ -1,5 +1,7 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 
 from users.models import User
 
@@ -32,17 +34,26 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='name_measurement_unit'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
 
 
 class Recipe(models.Model):
+    DERIVED_FIELDS = ('favorites_count', 'in_carts_count', 'has_renditions')
+
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
         verbose_name='Автор рецепта',
+        db_index=False,
     )
     name = models.CharField(max_length=200, verbose_name='Название рецепта')
     image = models.ImageField(
@@ -64,20 +75,98 @@ class Recipe(models.Model):
     created = models.DateTimeField(
         'Дата публикации', auto_now_add=True, null=True
     )
-    is_favorited = models.BooleanField(null=True)
-    is_in_shopping_cart = models.BooleanField(null=True)
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Раз в избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Раз в списке покупок'
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    has_renditions = models.BooleanField(
+        default=False, editable=False, verbose_name='Миниатюры готовы'
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'], name='recipe_created_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-created'], name='recipe_author_created_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count'], name='recipe_favorites_count_idx'
+            ),
+            models.Index(
+                fields=['-in_carts_count'], name='recipe_in_carts_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if update_fields is None and not force_insert and not (
+            self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DERIVED_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(
+            force_insert=force_insert, force_update=force_update,
+            using=using, update_fields=update_fields
+        )
+
+    @classmethod
+    def change_counters(cls, recipe_ids, field, delta):
+        recipes = cls.objects.filter(pk__in=recipe_ids)
+        if delta < 0:
+            recipes = recipes.filter(**{f'{field}__gte': -delta})
+        recipes.update(**{field: models.F(field) + delta})
+
+    @classmethod
+    def reconcile_counters(cls):
+        actual = {
+            'favorites_count': Favorite.objects.filter(
+                recipe=models.OuterRef('pk')
+            ),
+            'in_carts_count': ShoppingCart.objects.filter(
+                recipe=models.OuterRef('pk')
+            ),
+        }
+        actual = {
+            field: Coalesce(models.Subquery(
+                queryset.order_by().values('recipe').annotate(
+                    total=models.Count('pk')
+                ).values('total'),
+                output_field=models.IntegerField()
+            ), 0)
+            for field, queryset in actual.items()
+        }
+        drifted = list(cls.objects.annotate(
+            actual_favorites_count=actual['favorites_count'],
+            actual_in_carts_count=actual['in_carts_count']
+        ).exclude(
+            favorites_count=models.F('actual_favorites_count'),
+            in_carts_count=models.F('actual_in_carts_count')
+        ).values_list('pk', flat=True))
+        if drifted:
+            cls.objects.filter(pk__in=drifted).update(**actual)
+        return drifted
+
 
 class IngredientRecipe(models.Model):
-    recipes = models.ForeignKey(Recipe, on_delete=models.CASCADE, null=True)
+    recipes = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, null=True, db_index=False
+    )
     ingredients = models.ForeignKey(
         Ingredient, on_delete=models.SET_NULL, null=True,
         verbose_name='Ингредиент'
@@ -94,19 +183,66 @@ class IngredientRecipe(models.Model):
         verbose_name = 'Ингредиент рецепта'
         verbose_name_plural = 'Ингредиенты рецепта'
         ordering = ('pk',)
+        indexes = [
+            models.Index(
+                fields=['recipes', 'ingredients'],
+                name='recipe_ingredient_idx'
+            )
+        ]
 
     def __str__(self):
         return f'Ингредиент из рецепта {self.recipes.name}'
 
+    @classmethod
+    def set_for_recipe(cls, recipe, amounts):
+        current = {}
+        stale = []
+        previous = {}
+        for row in cls.objects.filter(recipes=recipe).only(
+            'pk', 'ingredients_id', 'amount'
+        ):
+            previous[row.ingredients_id] = (
+                previous.get(row.ingredients_id, 0) + row.amount
+            )
+            if row.ingredients_id in current:
+                stale.append(row.pk)
+            else:
+                current[row.ingredients_id] = row
+        changed = []
+        for ingredient_id, row in current.items():
+            if ingredient_id not in amounts:
+                stale.append(row.pk)
+            elif row.amount != amounts[ingredient_id]:
+                row.amount = amounts[ingredient_id]
+                changed.append(row)
+        created = [
+            cls(recipes=recipe, ingredients_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        if stale:
+            cls.objects.filter(pk__in=stale).delete()
+        if changed:
+            cls.objects.bulk_update(changed, ('amount',))
+        if created:
+            cls.objects.bulk_create(created)
+        if stale or changed or created:
+            ShoppingListItem.update_recipe(recipe.pk, {
+                ingredient_id: (amounts.get(ingredient_id, 0)
+                                - previous.get(ingredient_id, 0))
+                for ingredient_id in previous.keys() | amounts.keys()
+            })
+        return len(stale) + len(changed) + len(created)
+
 
 class Subscription(models.Model):
     follower = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='follower',
-        verbose_name='Подписчик'
+        verbose_name='Подписчик', db_index=False
     )
     author = models.ForeignKey(
         User, on_delete=models.CASCADE,
-        verbose_name='Автор рецепта'
+        verbose_name='Автор рецепта', db_index=False
     )
     created = models.DateTimeField(
         'Дата публикации', auto_now_add=True, null=True
@@ -116,6 +252,15 @@ class Subscription(models.Model):
         verbose_name = 'Подписки'
         verbose_name_plural = 'Подписки'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['follower', '-created', '-id'],
+                name='follower_created_id_idx'
+            ),
+            models.Index(
+                fields=['author', 'follower'], name='author_follower_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['follower', 'author'], name='follower_author'
@@ -128,11 +273,12 @@ class Subscription(models.Model):
 
 class Favorite(models.Model):
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE, verbose_name='Пользователь'
+        User, on_delete=models.CASCADE, verbose_name='Пользователь',
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name='favorites',
-        verbose_name='Рецепт'
+        verbose_name='Рецепт', db_index=False
     )
     created = models.DateTimeField('дата публикации', auto_now_add=True)
 
@@ -145,6 +291,12 @@ class Favorite(models.Model):
                 fields=['user', 'recipe'], name='user_recipe'
             )
         ]
+        indexes = [
+            models.Index(fields=['recipe', 'user'], name='recipe_user_idx'),
+            models.Index(
+                fields=['created', 'recipe'], name='favorite_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.recipe} в избранном у {self.user}'
@@ -153,11 +305,11 @@ class Favorite(models.Model):
 class ShoppingCart(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='shopping_cart',
-        verbose_name='Пользователь'
+        verbose_name='Пользователь', db_index=False
     )
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name='shopping_cart',
-        verbose_name='Рецепт'
+        verbose_name='Рецепт', db_index=False
     )
     created = models.DateTimeField('Дата публикации', auto_now_add=True)
 
@@ -170,6 +322,231 @@ class ShoppingCart(models.Model):
                 fields=['user', 'recipe'], name='user_recipe_shopping'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'], name='recipe_user_shopping_idx'
+            ),
+            models.Index(
+                fields=['created', 'recipe'], name='shopping_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.recipe} в списке покупок у {self.user}'
+
+    @classmethod
+    def get_shopping_list(cls, user):
+        return list(ShoppingListItem.objects.filter(user=user).values(
+            name=models.F('ingredient__name'),
+            measurement_unit=models.F('ingredient__measurement_unit'),
+            amount=models.F('total_amount')
+        ).order_by('name'))
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='shopping_list_items',
+        verbose_name='Пользователь', db_index=False
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE,
+        related_name='shopping_list_items', verbose_name='Ингредиент'
+    )
+    total_amount = models.IntegerField(default=0, verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'], name='user_ingredient_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} в списке покупок у {self.user}'
+
+    @staticmethod
+    def recipe_amounts(recipe_ids):
+        amounts = {}
+        for ingredient_id, amount in IngredientRecipe.objects.filter(
+            recipes_id__in=recipe_ids, ingredients__isnull=False
+        ).values_list('ingredients_id', 'amount'):
+            amounts[ingredient_id] = amounts.get(ingredient_id, 0) + amount
+        return amounts
+
+    @classmethod
+    def apply_deltas(cls, user_ids, deltas):
+        user_ids = list(user_ids)
+        deltas = {
+            ingredient_id: delta for ingredient_id, delta in deltas.items()
+            if ingredient_id is not None and delta
+        }
+        if not user_ids or not deltas:
+            return
+        cls.objects.bulk_create([
+            cls(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items() if delta > 0
+        ], ignore_conflicts=True)
+        items = cls.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=list(deltas)
+        )
+        items.update(total_amount=models.F('total_amount') + models.Case(
+            *(models.When(ingredient_id=ingredient_id, then=delta)
+              for ingredient_id, delta in deltas.items()),
+            output_field=models.IntegerField()
+        ))
+        items.filter(total_amount__lte=0).delete()
+
+    @classmethod
+    def add_recipes(cls, user_id, recipe_ids, sign=1):
+        cls.apply_deltas([user_id], {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in cls.recipe_amounts(
+                recipe_ids
+            ).items()
+        })
+
+    @classmethod
+    def remove_recipes(cls, user_id, recipe_ids):
+        cls.add_recipes(user_id, recipe_ids, sign=-1)
+
+    @classmethod
+    def update_recipe(cls, recipe_id, deltas):
+        cls.apply_deltas(ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True), deltas)
+
+    @staticmethod
+    def live_totals(user_ids=None):
+        rows = IngredientRecipe.objects.filter(
+            recipes__shopping_cart__isnull=False, ingredients__isnull=False
+        )
+        if user_ids is not None:
+            rows = rows.filter(recipes__shopping_cart__user_id__in=user_ids)
+        return rows.values_list(
+            'recipes__shopping_cart__user_id', 'ingredients_id'
+        ).annotate(total=models.Sum('amount')).order_by()
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls, user_ids=None, batch_size=1000):
+        items = cls.objects.all()
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            items = items.filter(user_id__in=user_ids)
+        items.delete()
+        batch = []
+        created = 0
+        for user_id, ingredient_id, total in cls.live_totals(
+            user_ids
+        ).iterator():
+            batch.append(cls(
+                user_id=user_id, ingredient_id=ingredient_id,
+                total_amount=total
+            ))
+            if len(batch) >= batch_size:
+                cls.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        cls.objects.bulk_create(batch)
+        return created + len(batch)
+
+    @classmethod
+    def verify(cls, user_ids=None):
+        stored = cls.objects.all()
+        if user_ids is not None:
+            stored = stored.filter(user_id__in=user_ids)
+        expected = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in cls.live_totals(user_ids)
+        }
+        actual = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in stored.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            )
+        }
+        return sorted(
+            (key, expected.get(key), actual.get(key))
+            for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        )
+
+
+class RecipeRanking(models.Model):
+    DAY = '24h'
+    WEEK = '7d'
+    MONTH = '30d'
+    WINDOW_CHOICES = (
+        (DAY, 'Сутки'),
+        (WEEK, 'Неделя'),
+        (MONTH, 'Месяц'),
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='rankings',
+        verbose_name='Рецепт', db_index=False
+    )
+    window = models.CharField(
+        max_length=3, choices=WINDOW_CHOICES, verbose_name='Период'
+    )
+    score = models.FloatField(verbose_name='Рейтинг')
+    updated = models.DateTimeField('Дата расчёта')
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        ordering = ('window', '-score')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'window'], name='recipe_window_ranking'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['window', '-score'], name='ranking_window_score_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} за {self.window}: {self.score:.2f}'
+
+
+class ShoppingListExport(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Формируется'),
+        (DONE, 'Готов'),
+        (FAILED, 'Ошибка'),
+    )
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='shopping_list_exports',
+        verbose_name='Пользователь'
+    )
+    format = models.CharField(max_length=10, verbose_name='Формат')
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING,
+        db_index=True, verbose_name='Статус'
+    )
+    file = models.FileField(
+        upload_to='shopping_lists/', blank=True, verbose_name='Файл'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+    claimed_at = models.DateTimeField(
+        'Взята в работу', null=True, blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Выгрузка списка покупок'
+        verbose_name_plural = 'Выгрузки списков покупок'
+        ordering = ('created',)
+
+    def __str__(self):
+        return f'Выгрузка {self.format} для {self.user}'
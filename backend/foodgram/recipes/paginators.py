@@ -1,7 +1,135 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def approximate_count(queryset):
+    queryset = queryset.order_by()
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        return int(cursor.fetchone()[0][0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        position, reverse = self.decode_cursor(request)
+        self.count = self.get_count(queryset, request)
+        if reverse:
+            queryset = queryset.order_by('created', 'id')
+            if position is not None:
+                created, pk = position
+                queryset = queryset.filter(
+                    Q(created__gt=created) | Q(created=created, id__gt=pk)
+                )
+        else:
+            queryset = queryset.order_by('-created', '-id')
+            if position is not None:
+                created, pk = position
+                queryset = queryset.filter(
+                    Q(created__lt=created) | Q(created=created, id__lt=pk)
+                )
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.order_by().count()
+        if mode == 'approx':
+            return approximate_count(queryset)
+        return None
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.make_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.make_link(self.page[0], reverse=True)
+
+    def make_link(self, obj, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(obj, reverse)
+        )
+
+    def encode_cursor(self, obj, reverse):
+        value = f'{obj.created.isoformat()}|{obj.pk}|{int(reverse)}'
+        return base64.urlsafe_b64encode(value.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            value = base64.urlsafe_b64decode(encoded.encode('ascii'))
+            created, pk, reverse = value.decode('ascii').split('|')
+            return (
+                (datetime.fromisoformat(created), int(pk)),
+                reverse == '1'
+            )
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 1000
+    cursor_query_param = KeysetPagination.cursor_query_param
+    keyset_orderings = ((), ('-created',), ('-created', '-id'))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (self.cursor_query_param in request.query_params
+                and queryset.query.order_by in self.keyset_orderings):
+            self.keyset = KeysetPagination(self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,110 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+
+POSTGRES_UPDATE_SQL = '''
+    UPDATE recipes_recipe SET search_vector =
+        setweight(to_tsvector(%s, coalesce(recipes_recipe.name, '')), 'A')
+        || setweight(to_tsvector(%s, coalesce((
+            SELECT string_agg(recipes_ingredient.name, ' ')
+            FROM recipes_ingredientrecipe
+            JOIN recipes_ingredient
+                ON recipes_ingredient.id
+                = recipes_ingredientrecipe.ingredients_id
+            WHERE recipes_ingredientrecipe.recipes_id = recipes_recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector(%s, coalesce(recipes_recipe.text, '')), 'C')
+'''
+
+SQLITE_INSERT_SQL = '''
+    INSERT INTO recipes_recipe_fts(rowid, name, ingredients, text)
+    SELECT recipes_recipe.id, recipes_recipe.name, coalesce((
+        SELECT group_concat(recipes_ingredient.name, ' ')
+        FROM recipes_ingredientrecipe
+        JOIN recipes_ingredient
+            ON recipes_ingredient.id = recipes_ingredientrecipe.ingredients_id
+        WHERE recipes_ingredientrecipe.recipes_id = recipes_recipe.id
+    ), ''), recipes_recipe.text
+    FROM recipes_recipe
+'''
+
+SQLITE_SEARCH_SQL = '''
+    SELECT rowid, -bm25(recipes_recipe_fts, 10.0, 4.0, 1.0) AS search_rank
+    FROM recipes_recipe_fts
+    WHERE recipes_recipe_fts MATCH %s
+    ORDER BY search_rank DESC, rowid DESC
+    LIMIT %s
+'''
+
+
+def update_search_index(recipe_ids=None, cursor=None):
+    if recipe_ids is not None:
+        recipe_ids = [pk for pk in recipe_ids if pk is not None]
+        if not recipe_ids:
+            return
+    if cursor is None:
+        with connection.cursor() as cursor:
+            return update_search_index(recipe_ids, cursor)
+    vendor = cursor.db.vendor
+    if vendor == 'postgresql':
+        sql, params = POSTGRES_UPDATE_SQL, [SEARCH_CONFIG] * 3
+        if recipe_ids is not None:
+            sql += ' WHERE recipes_recipe.id = ANY(%s)'
+            params.append(recipe_ids)
+        cursor.execute(sql, params)
+    elif vendor == 'sqlite':
+        if recipe_ids is None:
+            cursor.execute('DELETE FROM recipes_recipe_fts')
+            cursor.execute(SQLITE_INSERT_SQL)
+            return
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        cursor.execute(
+            'DELETE FROM recipes_recipe_fts '
+            f'WHERE rowid IN ({placeholders})', recipe_ids
+        )
+        cursor.execute(
+            f'{SQLITE_INSERT_SQL} WHERE recipes_recipe.id IN ({placeholders})',
+            recipe_ids
+        )
+
+
+def remove_from_search_index(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM recipes_recipe_fts WHERE rowid = %s', [recipe_id]
+            )
+
+
+def search_recipes(queryset, value):
+    value = value.strip()
+    if not value:
+        return queryset
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).order_by(
+            SearchRank(F('search_vector'), query).desc(), '-created'
+        )
+    if connection.vendor == 'sqlite':
+        words = re.findall(r'\w+', value)
+        if not words:
+            return queryset.none()
+        match = ' '.join(f'"{word}"*' for word in words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SQLITE_SEARCH_SQL, [match, settings.RECIPE_SEARCH_LIMIT]
+            )
+            recipe_ids = [pk for pk, _ in cursor.fetchall()]
+        if not recipe_ids:
+            return queryset.none()
+        positions = ',{},'.format(','.join(map(str, recipe_ids)))
+        return queryset.filter(pk__in=recipe_ids).order_by(RawSQL(
+            "instr(%s, ',' || recipes_recipe.id || ',')", [positions]
+        ).asc())
+    return queryset.filter(name__icontains=value)
@@ -0,0 +1,150 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from core.cache import CATALOGUE_GENERATION_KEY, bump_generation
+from recipes.autocomplete import ingredient_index
+from recipes.links import links_added, links_removed
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.search import remove_from_search_index, update_search_index
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_index(instance, **kwargs):
+    update_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_search_index(instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def update_ingredient_recipe_search_index(instance, **kwargs):
+    update_search_index([instance.recipes_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_index(instance, created, **kwargs):
+    if not created:
+        update_search_index(IngredientRecipe.objects.filter(
+            ingredients=instance
+        ).values_list('recipes_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_api_cache(**kwargs):
+    bump_generation()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalogue_snapshot(**kwargs):
+    bump_generation(CATALOGUE_GENERATION_KEY)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        ShoppingListItem.add_recipes(instance.user_id, [instance.recipe_id])
+        return
+    stored = getattr(instance, '_stored_link', None)
+    if stored is not None and stored != (
+        instance.user_id, instance.recipe_id
+    ):
+        user_id, recipe_id = stored
+        ShoppingListItem.remove_recipes(user_id, [recipe_id])
+        ShoppingListItem.add_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    ShoppingListItem.remove_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(links_added, sender=ShoppingCart)
+def add_links_to_shopping_list(instances, **kwargs):
+    ShoppingListItem.add_recipes(
+        instances[0].user_id, [instance.recipe_id for instance in instances]
+    )
+
+
+@receiver(links_removed, sender=ShoppingCart)
+def remove_links_from_shopping_list(instances, **kwargs):
+    ShoppingListItem.remove_recipes(
+        instances[0].user_id, [instance.recipe_id for instance in instances]
+    )
+
+
+@receiver(pre_save, sender=Favorite)
+@receiver(pre_save, sender=ShoppingCart)
+def remember_stored_link(sender, instance, raw, **kwargs):
+    instance._stored_link = None
+    if instance.pk is not None and not raw:
+        instance._stored_link = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('user_id', 'recipe_id').first()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def update_recipe_counter(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    field = RECIPE_COUNTERS[sender]
+    if created:
+        Recipe.change_counters([instance.recipe_id], field, 1)
+        return
+    stored = getattr(instance, '_stored_link', None)
+    if stored is not None and stored[1] != instance.recipe_id:
+        Recipe.change_counters([stored[1]], field, -1)
+        Recipe.change_counters([instance.recipe_id], field, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    Recipe.change_counters([instance.recipe_id], RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(links_added, sender=Favorite)
+@receiver(links_added, sender=ShoppingCart)
+def increment_recipe_counters(sender, instances, **kwargs):
+    Recipe.change_counters(
+        [instance.recipe_id for instance in instances],
+        RECIPE_COUNTERS[sender], 1
+    )
+
+
+@receiver(links_removed, sender=Favorite)
+@receiver(links_removed, sender=ShoppingCart)
+def decrement_recipe_counters(sender, instances, **kwargs):
+    Recipe.change_counters(
+        [instance.recipe_id for instance in instances],
+        RECIPE_COUNTERS[sender], -1
+    )
@@ -0,0 +1,68 @@
+import heapq
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from core.cache import bump_generation
+from recipes.models import Favorite, RecipeRanking, ShoppingCart
+
+WINDOWS = {
+    RecipeRanking.DAY: (timedelta(hours=24), timedelta(hours=6)),
+    RecipeRanking.WEEK: (timedelta(days=7), timedelta(days=1)),
+    RecipeRanking.MONTH: (timedelta(days=30), timedelta(days=7)),
+}
+ACTIVITY_WEIGHTS = (
+    (Favorite, 1.0),
+    (ShoppingCart, 0.5),
+)
+
+
+def hourly_activity(since):
+    for model, weight in ACTIVITY_WEIGHTS:
+        rows = model.objects.filter(created__gte=since).annotate(
+            hour=TruncHour('created')
+        ).values_list('recipe_id', 'hour').annotate(
+            total=Count('pk')
+        ).order_by()
+        for recipe_id, hour, total in rows.iterator():
+            yield recipe_id, hour, weight * total
+
+
+def score_recipes(activity, now):
+    scores = {window: {} for window in WINDOWS}
+    for recipe_id, hour, weight in activity:
+        age = max(now - hour, timedelta())
+        for window, (length, half_life) in WINDOWS.items():
+            if age <= length:
+                window_scores = scores[window]
+                window_scores[recipe_id] = (
+                    window_scores.get(recipe_id, 0)
+                    + weight * 0.5 ** (age / half_life)
+                )
+    return scores
+
+
+def refresh_rankings(now=None, size=None):
+    now = now or timezone.now()
+    size = size or settings.TRENDING_SIZE
+    longest = max(length for length, _ in WINDOWS.values())
+    scores = score_recipes(hourly_activity(now - longest), now)
+    rankings = [
+        RecipeRanking(
+            recipe_id=recipe_id, window=window, score=score, updated=now
+        )
+        for window, window_scores in scores.items()
+        for recipe_id, score in heapq.nlargest(
+            size, window_scores.items(), key=itemgetter(1)
+        )
+    ]
+    with transaction.atomic():
+        RecipeRanking.objects.all().delete()
+        RecipeRanking.objects.bulk_create(rankings)
+    bump_generation()
+    return rankings
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from users.models import User
+
+
+class TokenCache:
+    key_prefix = 'auth_token:'
+
+    def __init__(self, max_entries, timeout, shared):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if self.shared:
+            return cache.get(self.key_prefix + key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, snapshot = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return snapshot
+
+    def set(self, key, snapshot):
+        if self.shared:
+            cache.set(self.key_prefix + key, snapshot, self.timeout)
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        if self.shared:
+            cache.delete_many([self.key_prefix + key for key in keys])
+            return
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TIMEOUT,
+    settings.TOKEN_CACHE_SHARED
+)
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(key)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, self.make_snapshot(user, token))
+            return user, token
+        return self.restore_snapshot(key, snapshot)
+
+    def make_snapshot(self, user, token):
+        names = tuple(
+            field.attname for field in User._meta.concrete_fields
+            if field.attname != 'password'
+        )
+        values = tuple(getattr(user, name) for name in names)
+        return names, values, token.created
+
+    def restore_snapshot(self, key, snapshot):
+        names, values, created = snapshot
+        user = User.from_db(DEFAULT_DB_ALIAS, names, values)
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        return user, Token(key=key, user=user, created=created)
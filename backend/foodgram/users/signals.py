@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import token_cache
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(instance, update_fields, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    token_cache.invalidate(*Token.objects.filter(
+        user=instance
+    ).values_list('key', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **kwargs):
+    token_cache.invalidate(instance.key)